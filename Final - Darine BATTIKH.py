@@ -41,22 +41,29 @@
 
 
 # Importing necessary packages
+import os
+
 import pandas as pd 
 
 import numpy as np
 
-import matplotlib.pyplot as plt
-
-import seaborn as sns
+import tmdb
 
 
-#Importing the database we will work on
-df = pd.read_csv('tmdb-movies.csv')
+#Importing the database we will work on, already cleaned (see tmdb/clean.py).
+#The cleaned frame is cached in .tmdb_cache/ next to the CSV and rebuilt only
+#when the CSV or the cleaning parameters change.
+#With TMDB_PROFILE=1 every stage (parsing, cleaning, stat(), correlation,
+#plots) is timed and a summary table is printed at the end of the run.
+df = tmdb.load_movies('tmdb-movies.csv')
+cleaning = df.attrs['cleaning']
 
 
 # <a id='wrangling'></a>
 # ## Traitement des Données
 # Dans cette section du rapport, nous allons charger les données, vérifier leur propreté, puis découper et nettoyer notre ensemble de données pour l'analyse. 
+# 
+# Le nettoyage lui-même est fait par `tmdb.clean_movies`, qui enregistre au passage ce qu'il a trouvé (taille initiale, doublons, valeurs manquantes) : les cellules suivantes affichent ce résumé, qui reste disponible même quand la base nettoyée est lue depuis le cache.
 # ### Propriétés Générales
 
 # In[2]:
@@ -69,8 +76,8 @@ df.head()
 # In[3]:
 
 
-print(df.shape)
-df.info()
+print(cleaning['raw_shape'])
+df.info(memory_usage='deep')
 
 
 # #### Insight
@@ -83,54 +90,22 @@ df.info()
 # In[4]:
 
 
-# Dropping unecessary columns
-df.drop(['id', 'imdb_id','homepage','tagline', 'overview',  'keywords'], axis=1, inplace=True)
-df.info()
+# Dropped unecessary columns
+cleaning['dropped_columns']
 
 
 # In[5]:
 
 
-# Checking and removing duplicated rows
-sum(df.duplicated())
-
-
-# In[6]:
-
-
-df.drop_duplicates(inplace=True)
-
-
-# In[7]:
-
-
-sum(df.duplicated())
+# Duplicated rows found and removed
+cleaning['duplicates']
 
 
 # In[8]:
 
 
-# Checking and fixing missing values
-df.isnull().sum()
-
-
-# In[9]:
-
-
-df.fillna(0, inplace = True)
-
-
-# In[10]:
-
-
-df.isnull().sum()
-
-
-# In[11]:
-
-
-# Correcting the release date data type
-df['release_date'] = pd.to_datetime(df['release_date'])
+# Missing values found: numbers are filled with 0, missing text stays null
+pd.Series(cleaning['missing'])
 
 
 # Maintenant que nous avons nettoyé notre base de données des colonnes non essentielles, des valeurs manquantes, des lignes redondantes et des types de données erronés, nous allons créer trois nouvelles colonnes:
@@ -144,26 +119,56 @@ df['release_date'] = pd.to_datetime(df['release_date'])
 # 
 # 3. **release_month**: dans cette colonne, nous ne considérerons que le mois car le mois de sortie peut affecter le succès du film. Pour cela, nous allons supprimer la colonne release_date. 
 
-# In[12]:
+# Ces trois colonnes sont calculées par `tmdb.clean_movies`, avec le bénéfice nominal **prft** (revenue - budget) utilisé pour l'évolution par année :
+# 
+# ```
+# df['profits'] = df['revenue_adj'] - df['budget_adj']
+# df['profits_rate'] = df['revenue_adj'] / df['budget_adj']   # seulement si budget_adj > 0
+# df['prft'] = df['revenue'] - df['budget']
+# df['release_month'] = df['release_date'].dt.month
+# ```
+# 
+# Le taux de profits n'a pas de sens pour un film dont le budget est inconnu (0) : il est alors laissé vide plutôt que de valoir l'infini, et ces films sont exclus des classements par taux de profits.
 
+# In[14]:
 
-df['profits'] = df['revenue_adj'] - df['budget_adj']
-df['profits_rate'] = df['revenue_adj'] / df['budget_adj']
-df.drop(['revenue_adj', 'budget_adj'], axis=1, inplace=True)
 
+print(df.shape)
+df.head()
 
-# In[13]:
 
+# Enfin, nous décomposons une seule fois les colonnes à valeurs multiples (genres, cast, production_companies) en tables de codes, afin que les comptages de la section suivante n'aient plus à rejoindre et redécouper les chaînes à chaque appel. De même, le classement des films selon chaque critère (profits, taux de profits, ...) n'est calculé qu'une fois.
+# 
+# Les résultats des analyses (tableaux, comptages, corrélations, bénéfices annuels) sont en outre conservés sur disque, indexés par l'empreinte du jeu de données nettoyé : tant que `tmdb-movies.csv` et les paramètres de nettoyage ne changent pas, le rapport est relu depuis le cache au lieu d'être recalculé.
 
-df['release_month'] = df['release_date'].dt.month
-df.drop(['release_date'], axis=1, inplace=True)
+# In[ ]:
 
 
-# In[14]:
+# Exploding the '|'-separated columns once, on first use (not at all when every table is cached)
+token_indexes = tmdb.TokenIndexes(df)
+# Orderings by profits, profits_rate, ... computed once and shared by every top-N
+rankings = tmdb.Rankings(df)
+# Results keyed by the dataset fingerprint and the query, least recently used evicted first
+results = tmdb.ResultCache.for_csv('tmdb-movies.csv')
+fingerprint = df.attrs.get('fingerprint')
 
 
-print(df.shape)
-df.head()
+# In[ ]:
+
+
+# With TMDB_FIGURES set, the figures are not shown: they are collected with the
+# tables below in a headless report, rendered in parallel at the end of the notebook
+# (only those whose data changed) and assembled into TMDB_FIGURES/report.html.
+report = tmdb.Report(os.environ['TMDB_FIGURES']) if 'TMDB_FIGURES' in os.environ else None
+
+def section(title):
+    if report is not None:
+        report.section(title)
+
+def show(title, table):
+    if report is not None:
+        report.table(title, table)
+    return table
 
 
 # <a id='eda'></a>
@@ -183,14 +188,21 @@ df.head()
 # In[48]:
 
 
+section('Question de Recherche 1 : Succès Commercial')
+
+# All the tables of this question are computed together, one ranking per criterion
+stat_results = results.cached(
+    fingerprint, 'stat_many', tmdb.REPORT_QUERIES,
+    lambda: tmdb.stat_many(df, tmdb.REPORT_QUERIES, indexes=token_indexes, rankings=rankings))
+
 def stat(sortBy, headCount, column):
-    df_stat = df.sort_values(by=sortBy, ascending = False).head(headCount)
-    df_stat.loc[:, column].head()
-    df_stat[column] = df_stat[column].astype(str)
-    df_stat_sep = df_stat[column].str.cat(sep='|')
-    df_stat_sep = pd.Series(df_stat_sep.split('|'))
-    df_stat_sep = df_stat_sep.value_counts(ascending = False).to_frame()
-    return df_stat_sep
+    data = stat_results.get((sortBy, headCount, column))
+    if data is None:
+        data = results.cached(
+            fingerprint, 'stat', [sortBy, headCount, column],
+            lambda: tmdb.stat(df, sortBy, headCount, column, indexes=token_indexes, rankings=rankings))
+    show('%s des %d films aux plus hauts %s' % (column, headCount, sortBy), data.head())
+    return data
 
 data = stat('profits', 50, 'genres')
 data.head()
@@ -329,10 +341,16 @@ data.head()
 # In[29]:
 
 
-df_loved_movies = df
-df_loved_movies.drop(df_loved_movies[df_loved_movies['vote_count'] < 1000].index, inplace=True)
-df_loved_movies = df_loved_movies.sort_values(by='vote_average', ascending = False).head(1000)
-df_loved_movies.drop(df_loved_movies[df_loved_movies['production_companies'] == 'nan'].index, inplace=True)
+section('Question de Recherche 2 : Popularité')
+
+# Selecting the loved movies as row positions of df, which is left untouched
+with tmdb.stage('loved_movies', len(df)) as selecting:
+    loved_movies = (tmdb.Selection(df, rankings=rankings)
+                    .where('vote_count', '>=', 1000)
+                    .top('vote_average', 1000)
+                    .notnull('production_companies'))
+    df_loved_movies = loved_movies.frame()
+    selecting.rows_out = len(df_loved_movies)
 
 
 # In[30]:
@@ -347,13 +365,14 @@ df_loved_movies.head()
 # In[72]:
 
 
-# Defining our plotting function that will be used for all plots
+# Defining our plotting function that will be used for all plots.
+# Above tmdb.plots.DENSITY_THRESHOLD points it draws a hexbin density instead of
+# one marker per movie; with TMDB_FIGURES set, it adds the figure to the report.
 def plotting (title, x, y, x_label, y_label):
-    plt.scatter(x, y, alpha = 0.5)
-    plt.xlabel(x_label)
-    plt.ylabel(y_label)
-    plt.title(title)
-    plt.show()
+    if report is None:
+        tmdb.plotting(title, x, y, x_label, y_label)
+    else:
+        report.scatter(title, x, y, x_label, y_label)
     
 plotting ('Correlation Between Average Vote and Popularity',df_loved_movies['vote_average'], df_loved_movies['popularity'],"Average Vote","Popularity")
 
@@ -368,11 +387,13 @@ plotting ('Correlation Between Average Vote and Popularity',df_loved_movies['vot
 # In[32]:
 
 
-df_loved_movies['production_companies'] = df_loved_movies['production_companies'].astype(str)
-df_loved_movies_companies = df_loved_movies['production_companies'].str.cat(sep='|')
-companies = pd.Series(df_loved_movies_companies.split('|'))
-count_loved_movies_campanies = companies.value_counts(ascending = False).to_frame()
-count_loved_movies_campanies.head(10)
+# Token counts, split across TMDB_WORKERS processes when set
+def loved_value_counts(column):
+    return results.cached(fingerprint, 'value_counts', [loved_movies.steps, column],
+                          lambda: tmdb.value_counts(df_loved_movies[column]))
+
+count_loved_movies_campanies = loved_value_counts('production_companies')
+show('Sociétés de production des films les mieux notés', count_loved_movies_campanies.head(10))
 
 
 # #### Insight
@@ -383,11 +404,8 @@ count_loved_movies_campanies.head(10)
 # In[33]:
 
 
-df_loved_movies['cast'] = df_loved_movies['cast'].astype(str)
-df_loved_movies_companies = df_loved_movies['cast'].str.cat(sep='|')
-companies = pd.Series(df_loved_movies_companies.split('|'))
-count_loved_movies_campanies = companies.value_counts(ascending = False).to_frame()
-count_loved_movies_campanies.head(50)
+count_loved_movies_campanies = loved_value_counts('cast')
+show('Acteurs des films les mieux notés', count_loved_movies_campanies.head(50))
 
 
 # #### Insight
@@ -398,11 +416,8 @@ count_loved_movies_campanies.head(50)
 # In[34]:
 
 
-df_loved_movies['genres'] = df_loved_movies['genres'].astype(str)
-df_loved_movies_companies = df_loved_movies['genres'].str.cat(sep='|')
-companies = pd.Series(df_loved_movies_companies.split('|'))
-count_loved_movies_campanies = companies.value_counts(ascending = False).to_frame()
-count_loved_movies_campanies.head(10)
+count_loved_movies_campanies = loved_value_counts('genres')
+show('Genres des films les mieux notés', count_loved_movies_campanies.head(10))
 
 
 # #### Insight
@@ -413,7 +428,11 @@ count_loved_movies_campanies.head(10)
 # In[35]:
 
 
-df.corr()
+section('Question de Recherche 3 : Popularité et Succès Commercial')
+
+# Pearson correlation of the numeric columns; method='spearman' for rank correlation
+show('Matrice de corrélation',
+     results.cached(fingerprint, 'correlation_matrix', 'pearson', lambda: tmdb.correlation_matrix(df)))
 
 
 # In[44]:
@@ -450,14 +469,15 @@ plotting ('Correlation Between Profits Rate and Average Vote',df_loved_movies['v
 # In[40]:
 
 
-df['prft'] = df['revenue'] - df['budget']
-plt.figure(figsize=(10,8))
-sns.lineplot(x = df['release_year'], y = df['prft'])
-plt.title('Evolution du Bénéfice par Année')
-plt.xlabel("Year")
-plt.ylabel("Bénéfice")
-plt.xlim(1955,2025)
-plt.show()
+section('Evolution du Bénéfice par Année')
+
+# Yearly profit statistics, aggregated once: the plot only draws one point per year
+yearly_profits = results.cached(fingerprint, 'yearly_profits', 'prft',
+                                lambda: tmdb.ProfitCube.build(df).summary('prft'))
+if report is not None:
+    report.yearly(yearly_profits, 'Evolution du Bénéfice par Année', "Year", "Bénéfice", xlim=(1955,2025))
+else:
+    tmdb.plot_yearly(yearly_profits, 'Evolution du Bénéfice par Année', "Year", "Bénéfice", xlim=(1955,2025))
 
 
 # #### Insight
@@ -493,8 +513,45 @@ plt.show()
 # 
 # En outre, il serait plus efficace de construire un algorithme d'apprentissage automatique qui automatisera le processus de prédiction des films susceptibles d'avoir du succès commerciale et/ou popularité.
 
+# ### Prédiction du Succès
+# Une première version de cet algorithme : une régression ridge par critère de succès (`profits`, `profits_rate`, `vote_average`), à partir des genres, acteurs et sociétés de production (une colonne par valeur rencontrée dans au moins deux films), du mois de sortie, de la durée et du budget. Le modèle est entraîné sur 80 % des films et évalué (R²) sur les 20 % restants ; le vocabulaire des variables est enregistré avec le modèle, ce qui permet de noter de nouveaux catalogues par morceaux (`tmdb.score_csv`) sans le reconstruire.
+
 # In[ ]:
 
 
+section('Prédiction du Succès')
+
+# Training on 80% of the movies, R² on the held-out 20%; both are cached like the
+# other results and only recomputed when the dataset changes
+held_out = np.random.default_rng(0).random(len(df)) < 0.2
+split = {'held_out': 0.2, 'seed': 0}
+
+def train():
+    model = tmdb.SuccessModel.fit(df[~held_out])
+    # Saved with the other caches next to the CSV, for tmdb.score_csv
+    model.save(os.path.join(tmdb.csv_cache_dir('tmdb-movies.csv'), 'tmdb-movies-model'))
+    return model
+
+model = results.cached(fingerprint, 'success_model', split, train)
+show('R² sur les films mis de côté',
+     results.cached(fingerprint, 'success_model_r2', split, lambda: model.evaluate(df[held_out])))
+
+
+# In[ ]:
+
+
+# Features with the largest positive weight on profits
+show('Variables au plus fort poids sur les bénéfices', model.coefficients('profits').head(10))
+
+
+# In[ ]:
+
+
+# Headless mode: rendering the collected figures and writing the HTML report
+if report is not None:
+    report.render()
+    report.write_html(title='Investiguer la Base de Données des Films "The Movies Database"')
+
+
 
 
@@ -0,0 +1,70 @@
+"""The faster code paths give the same results as the plain pandas ones.
+
+Run with ``python -m pytest`` from the repository root.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import tmdb
+from tmdb import dedup, parallel
+from tmdb.synthetic import generate_movies
+
+
+@pytest.fixture(scope='module')
+def raw():
+    return generate_movies(5000, seed=1, duplicates=0.02)
+
+
+@pytest.fixture(scope='module')
+def csv_path(raw, tmp_path_factory):
+    path = tmp_path_factory.mktemp('movies') / 'tmdb-movies.csv'
+    raw.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def df(csv_path):
+    return tmdb.load_movies(csv_path, cache_dir=None)
+
+
+def test_streaming_matches_in_memory(csv_path, df):
+    analysis = tmdb.analyze_csv(csv_path, tmdb.REPORT_QUERIES, chunksize=700)
+    indexes = tmdb.build_token_indexes(df)
+    for query in tmdb.REPORT_QUERIES:
+        pd.testing.assert_frame_equal(analysis.stat(*query),
+                                      tmdb.stat(df, *query, indexes=indexes))
+    pd.testing.assert_frame_equal(analysis.corr(), tmdb.correlation_matrix(df))
+    assert analysis.cleaning == df.attrs['cleaning']
+
+
+def test_duplicated_rows_matches_pandas(raw):
+    frame = raw.drop(list(tmdb.DROPPED_COLUMNS), axis=1)
+    assert frame.duplicated().any()
+    np.testing.assert_array_equal(tmdb.duplicated_rows(frame), frame.duplicated().to_numpy())
+    key = list(tmdb.NEAR_DUPLICATE_KEY)
+    np.testing.assert_array_equal(tmdb.duplicated_rows(frame, key),
+                                  frame.duplicated(key).to_numpy())
+
+
+def test_duplicated_rows_with_hash_collisions(raw, monkeypatch):
+    # Eight possible keys: nearly every row collides with others and must be
+    # told apart by comparing values.
+    mix = dedup._mix
+    monkeypatch.setattr(dedup, '_mix', lambda keys: mix(keys) % np.uint64(8))
+    frame = raw.drop(list(tmdb.DROPPED_COLUMNS), axis=1)
+    np.testing.assert_array_equal(tmdb.duplicated_rows(frame), frame.duplicated().to_numpy())
+
+
+@pytest.mark.parametrize('column', ['genres', 'cast', 'production_companies', 'release_month'])
+def test_parallel_matches_serial(df, column, monkeypatch):
+    monkeypatch.setattr(parallel, 'MIN_ROWS_PER_WORKER', 500)
+    series = df[column]
+    serial = tmdb.TokenIndex.from_series(series)
+    index = parallel.token_index(series, workers=3)
+    np.testing.assert_array_equal(index.codes, serial.codes)
+    np.testing.assert_array_equal(index.indptr, serial.indptr)
+    pd.testing.assert_index_equal(index.tokens, serial.tokens)
+    pd.testing.assert_frame_equal(parallel.value_counts(series, workers=3),
+                                  serial.value_counts())
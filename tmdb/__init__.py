@@ -0,0 +1,22 @@
+"""Helpers for the TMDb movies analysis."""
+
+from .cache import csv_cache_dir, dataset_fingerprint, load_movies
+from .clean import (DATE_FORMAT, DROPPED_COLUMNS, READ_DTYPES, clean_movies, fill_and_derive,
+                    memory_report, read_movies_csv)
+from .corr import CorrelationAccumulator, correlation_matrix, spearman
+from .cube import ProfitCube
+from .dedup import NEAR_DUPLICATE_KEY, duplicated_rows, row_digests
+from .memo import ResultCache
+from .metrics import DERIVED_COLUMNS, derive_metrics, valid_mask
+from .model import FeatureVocabulary, SuccessModel, score_csv
+from .parallel import default_workers, token_index, value_counts
+from .plan import Plan, scan
+from .plots import FigureWriter, plot_yearly, plotting
+from .profile import Profiler, profiled, profiler, stage
+from .report import Report
+from .selection import MaskCache, Selection
+from .sketch import SpaceSaving
+from .stats import REPORT_QUERIES, Ranking, Rankings, stat, stat_many
+from .stream import StreamingAnalysis, analyze_csv, stream_movies
+from .tokens import (MULTI_VALUE_COLUMNS, TokenIndex, TokenIndexes, build_token_indexes,
+                     counts_to_frame)
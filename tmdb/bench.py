@@ -0,0 +1,160 @@
+"""Benchmark of the report pipeline on synthetic data.
+
+Times and memory-profiles each stage separately (CSV parsing, cleaning,
+token indexing, every ``stat()`` table, the loved-movies selection, the
+Pearson and Spearman correlation matrices, the yearly aggregation and the
+rendering of the report's figures) for several dataset sizes, along with
+the per-column memory of the CSV read with inferred and with declared types
+(:func:`tmdb.memory_report`), and writes the measurements as JSON so runs of
+different versions can be compared::
+
+    python -m tmdb.bench --rows 10k 100k 1M --output bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from .clean import clean_movies, memory_report, read_movies_csv
+from .corr import correlation_matrix
+from .cube import ProfitCube
+from .plots import FigureWriter, plot_yearly, plotting
+from .profile import Profiler, _rows
+from .selection import Selection
+from .stats import REPORT_QUERIES, Rankings, stat, stat_many
+from .synthetic import write_movies_csv
+from .tokens import build_token_indexes
+
+# The report's scatter plots of the loved movies, as (x, y) columns.
+LOVED_SCATTERS = (('vote_average', 'popularity'), ('profits', 'popularity'),
+                  ('profits_rate', 'popularity'), ('vote_average', 'profits'),
+                  ('vote_average', 'profits_rate'))
+
+
+def run_pipeline(path, memory=True, figures=None):
+    """Run and measure every stage of the report on the CSV at ``path``.
+
+    Returns the stage records (``'stages'``) and the :func:`tmdb.memory_report`
+    of the inferred-type frame against the declared-type one, by column
+    (``'frame_memory'``). The figures are rendered headless into the
+    ``figures`` directory (default: next to the CSV, named after it).
+    """
+    profiler = Profiler(enabled=True, memory=memory, log=os.devnull)
+
+    def measure(name, rows_in, function, *args, **kwargs):
+        with profiler.stage(name, rows_in) as stage:
+            result = function(*args, **kwargs)
+            stage.rows_out = _rows(result)
+        return result
+
+    inferred = measure('read_csv_inferred', None, pd.read_csv, path)
+    raw = measure('read_csv', None, read_movies_csv, path)
+    frame_memory = {column: {'dtype_before': row['dtype_before'],
+                             'bytes_before': int(row['bytes_before']),
+                             'dtype_after': row['dtype_after'],
+                             'bytes_after': int(row['bytes_after'])}
+                    for column, row in memory_report(inferred, raw).iterrows()}
+    del inferred
+    df = measure('clean', len(raw), clean_movies, raw)
+    del raw
+    indexes = measure('token_indexes', len(df), build_token_indexes, df)
+    for sortBy, headCount, column in REPORT_QUERIES:
+        measure('stat[%s,%d,%s]' % (sortBy, headCount, column), len(df), stat,
+                df, sortBy, headCount, column, indexes=indexes)
+    measure('stat_many', len(df), stat_many, df, REPORT_QUERIES, indexes=indexes)
+
+    def loved_movies():
+        return (Selection(df, rankings=Rankings(df))
+                .where('vote_count', '>=', 1000)
+                .top('vote_average', 1000)
+                .notnull('production_companies')
+                .frame())
+
+    loved = measure('loved_movies', len(df), loved_movies)
+    measure('corr', len(df), correlation_matrix, df)
+    measure('corr_spearman', len(df), correlation_matrix, df, method='spearman')
+    yearly = measure('yearly', len(df), lambda: ProfitCube.build(df).summary('prft'))
+
+    writer = FigureWriter(figures or os.path.splitext(path)[0] + '-figures')
+
+    def scatters():
+        for x, y in LOVED_SCATTERS:
+            plotting(x, loved[x], loved[y], x, y, output=writer.path(x + ' ' + y))
+
+    measure('plotting', len(loved), scatters)
+    measure('plot_yearly', len(yearly), plot_yearly, yearly, 'prft', 'release_year', 'prft',
+            output=writer.path('yearly'))
+    return {'stages': profiler.records, 'frame_memory': frame_memory}
+
+
+def parse_rows(text):
+    """'10k' -> 10000, '2.5M' -> 2500000."""
+    scale = {'k': 10 ** 3, 'm': 10 ** 6}.get(text[-1].lower(), 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def _revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, seed=0, memory=True, workdir=None, keep=False):
+    """Benchmark results for each dataset size, as a JSON-serializable dict."""
+    results = {'meta': {'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                        'revision': _revision(), 'python': platform.python_version(),
+                        'pandas': pd.__version__, 'numpy': np.__version__,
+                        'platform': platform.platform(), 'cpus': os.cpu_count(),
+                        'seed': seed, 'memory_traced': memory},
+               'runs': []}
+    workdir = workdir or tempfile.mkdtemp(prefix='tmdb-bench-')
+    for rows in sizes:
+        path = os.path.join(workdir, 'tmdb-movies-%d-%d.csv' % (rows, seed))
+        figures = os.path.splitext(path)[0] + '-figures'
+        if not os.path.exists(path):
+            write_movies_csv(path, rows, seed=seed)
+        try:
+            results['runs'].append(dict({'rows': rows, 'csv_bytes': os.path.getsize(path)},
+                                        **run_pipeline(path, memory, figures)))
+        finally:
+            if not keep:
+                os.remove(path)
+                shutil.rmtree(figures, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', nargs='+', type=parse_rows, default=[10000, 100000],
+                        help='dataset sizes, e.g. 10k 1M (default: 10k 100k)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='-', help='JSON file (default: stdout)')
+    parser.add_argument('--workdir', help='where to write the synthetic CSVs')
+    parser.add_argument('--keep', action='store_true', help='keep the synthetic CSVs and figures')
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help='skip tracemalloc, which slows the stages down')
+    args = parser.parse_args(argv)
+
+    results = run(args.rows, args.seed, args.memory, args.workdir, args.keep)
+    if args.output == '-':
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""On-disk cache of the cleaned dataset.
+
+The cleaned frame is written as an uncompressed Feather (Arrow IPC) file so
+later runs can memory-map it instead of parsing the CSV and cleaning again.
+Each cache entry is keyed by a fingerprint of the CSV contents and of the
+cleaning parameters; it is rebuilt automatically when either changes.
+"""
+
+import hashlib
+import json
+import os
+import warnings
+
+from .clean import DATE_FORMAT, DROPPED_COLUMNS, clean_movies, read_movies_csv
+from .profile import profiled
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - pyarrow is optional
+    feather = None
+
+
+# Bump when clean_movies() changes in a way that alters its output.
+CACHE_VERSION = 4
+
+DEFAULT_CACHE_DIR = '.tmdb_cache'
+
+
+def file_digest(path, blocksize=1 << 20):
+    """Hex BLAKE2b digest of a file's contents."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def dataset_fingerprint(path, params, known=None):
+    """Fingerprint of the CSV at ``path`` cleaned with ``params``.
+
+    ``known`` is the metadata of a previous cache entry; when the file's size
+    and modification time still match it, its content digest is reused
+    instead of re-reading the file.
+    """
+    stat = os.stat(path)
+    if known and known.get('size') == stat.st_size and known.get('mtime_ns') == stat.st_mtime_ns:
+        content = known['content']
+    else:
+        content = file_digest(path)
+    key = json.dumps({'content': content, 'params': params, 'version': CACHE_VERSION},
+                     sort_keys=True)
+    return {'fingerprint': hashlib.blake2b(key.encode(), digest_size=16).hexdigest(),
+            'content': content, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _read_meta(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def csv_cache_dir(path, cache_dir=DEFAULT_CACHE_DIR):
+    """The cache directory of the CSV at ``path``: ``cache_dir`` next to the CSV."""
+    return os.path.join(os.path.dirname(os.path.abspath(path)), cache_dir)
+
+
+@profiled('load_movies')
+def load_movies(path='tmdb-movies.csv', cache_dir=DEFAULT_CACHE_DIR,
+                drop_columns=DROPPED_COLUMNS, fill_value=0, date_format=DATE_FORMAT,
+                duplicate_key=None):
+    """Cleaned TMDb frame for the CSV at ``path``, served from cache if possible.
+
+    ``cache_dir`` is taken relative to the CSV's directory; pass ``None`` to
+    always read and clean the CSV. The cleaning summary is available in
+    ``df.attrs['cleaning']`` and the dataset fingerprint in
+    ``df.attrs['fingerprint']`` in both cases.
+    """
+    params = {'drop_columns': list(drop_columns), 'fill_value': fill_value,
+              'date_format': date_format,
+              'duplicate_key': None if duplicate_key is None else list(duplicate_key)}
+    if cache_dir is None or feather is None:
+        if cache_dir is not None:
+            warnings.warn('pyarrow is not installed, the cleaned dataset is not cached')
+        df = clean_movies(read_movies_csv(path), drop_columns, fill_value, date_format,
+                          duplicate_key)
+        df.attrs['fingerprint'] = dataset_fingerprint(path, params)['fingerprint']
+        return df
+
+    cache_dir = csv_cache_dir(path, cache_dir)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    meta_path = os.path.join(cache_dir, stem + '.json')
+    data_path = os.path.join(cache_dir, stem + '.feather')
+
+    meta = _read_meta(meta_path)
+    current = dataset_fingerprint(path, params, known=meta)
+    if meta and meta.get('fingerprint') == current['fingerprint'] and os.path.exists(data_path):
+        df = feather.read_table(data_path, memory_map=True).to_pandas()
+        df.attrs['cleaning'] = meta['cleaning']
+        df.attrs['fingerprint'] = current['fingerprint']
+        return df
+
+    df = clean_movies(read_movies_csv(path), drop_columns, fill_value, date_format,
+                      duplicate_key)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write data first and metadata last (both atomically) so an interrupted
+    # run never leaves metadata pointing at a missing or partial file.
+    attrs, df.attrs = df.attrs, {}
+    df.to_feather(data_path + '.tmp', compression='uncompressed')
+    df.attrs = attrs
+    os.replace(data_path + '.tmp', data_path)
+    current['cleaning'] = attrs['cleaning']
+    with open(meta_path + '.tmp', 'w') as f:
+        json.dump(current, f)
+    os.replace(meta_path + '.tmp', meta_path)
+    df.attrs['fingerprint'] = current['fingerprint']
+    return df
@@ -0,0 +1,129 @@
+"""The data cleaning section of the report, as reusable functions."""
+
+import numpy as np
+import pandas as pd
+
+from .dedup import duplicated_rows
+from .metrics import DERIVED_FROM, derive_metrics
+from .profile import profiled, stage
+
+
+DROPPED_COLUMNS = ('id', 'imdb_id', 'homepage', 'tagline', 'overview', 'keywords')
+
+# Free-text columns of tmdb-movies.csv. Their missing values stay nulls.
+TEXT_COLUMNS = ('imdb_id', 'original_title', 'cast', 'homepage', 'director', 'tagline',
+                'keywords', 'overview', 'genres', 'production_companies', 'release_date')
+
+# Text columns with few distinct values, stored as categoricals.
+CATEGORY_COLUMNS = ('genres', 'director')
+
+# Types given to read_csv instead of letting it infer them. Numbers are read
+# as floats so missing values can be represented. Money is read as float64:
+# float32 is off by up to 128-256 $ at box-office magnitudes (its spacing is
+# 256 at 3e9), and these columns feed the profits used as ranking keys.
+READ_DTYPES = dict(
+    {column: object for column in TEXT_COLUMNS},
+    **{column: 'category' for column in CATEGORY_COLUMNS},
+    **{column: np.float32 for column in ('popularity', 'runtime', 'vote_count',
+                                         'vote_average', 'release_year')},
+    **{column: np.float64 for column in ('budget', 'revenue', 'budget_adj', 'revenue_adj')})
+
+# Integer columns, downcast once their missing values are filled.
+COMPACT_DTYPES = {'runtime': np.int16, 'vote_count': np.int32, 'release_year': np.int16,
+                  'release_month': np.int8}
+
+# TMDb writes release dates as e.g. '6/9/15'. Only the month is kept, so the
+# two-digit year does not matter, and an explicit format avoids per-element
+# date inference.
+DATE_FORMAT = '%m/%d/%y'
+
+
+@profiled('read_csv')
+def read_movies_csv(path, **kwargs):
+    """``pd.read_csv`` of a TMDb export with the declared :data:`READ_DTYPES`."""
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = kwargs.get('usecols', header)
+    dtype = {column: READ_DTYPES[column] for column in usecols if column in READ_DTYPES}
+    dtype.update(kwargs.pop('dtype', {}))
+    return pd.read_csv(path, dtype=dtype, **kwargs)
+
+
+@profiled('fill_and_derive')
+def fill_and_derive(df, fill_value=0, date_format=DATE_FORMAT):
+    """Fill missing numbers and derive the analysis columns of a deduplicated frame.
+
+    Derives ``profits``, ``profits_rate``, ``prft`` and ``release_month``
+    (see :func:`tmdb.metrics.derive_metrics`), drops the columns they replace
+    and downcasts the integer columns. Missing text is left as null. A frame
+    read with only some columns gets the derived columns whose inputs it
+    has. Returns a new frame.
+    """
+    numeric = df.select_dtypes('number').columns
+    df = df.fillna({column: fill_value for column in numeric})
+
+    def money(column):
+        return df[column] if column in df else np.full(len(df), np.nan)
+
+    if 'release_date' in df:
+        with stage('to_datetime', len(df)):
+            release_date = pd.to_datetime(df['release_date'], format=date_format)
+    else:
+        release_date = np.full(len(df), np.datetime64('NaT'), dtype='datetime64[ns]')
+    columns = derive_metrics(money('revenue_adj'), money('budget_adj'), money('revenue'),
+                            money('budget'), release_date)
+    derived = [column for column, sources in DERIVED_FROM.items()
+               if all(source in df for source in sources)]
+    df = df.drop([column for column in ('revenue_adj', 'budget_adj', 'release_date')
+                  if column in df], axis=1)
+    for column in derived:
+        df[column] = columns[column]
+    return df.astype({column: dtype for column, dtype in COMPACT_DTYPES.items()
+                      if column in df})
+
+
+@profiled('clean')
+def clean_movies(raw, drop_columns=DROPPED_COLUMNS, fill_value=0, date_format=DATE_FORMAT,
+                 duplicate_key=None):
+    """Clean a raw ``tmdb-movies.csv`` frame the way the report does.
+
+    Drops the unused columns and duplicated rows, then fills missing numbers
+    and derives the analysis columns (see :func:`fill_and_derive`). Rows are
+    duplicates when all their columns match, or only the ``duplicate_key``
+    columns when given (e.g. :data:`tmdb.dedup.NEAR_DUPLICATE_KEY`); the
+    first one is kept. ``date_format`` is passed to ``pd.to_datetime``
+    (``None`` infers it).
+    ``raw`` is left untouched. A summary of what was found along the way is
+    stored in ``df.attrs['cleaning']``.
+    """
+    summary = {'raw_shape': list(raw.shape), 'dropped_columns': list(drop_columns)}
+    df = raw.drop(list(drop_columns), axis=1)
+
+    with stage('dedup', len(df)) as dedup:
+        duplicated = duplicated_rows(df, duplicate_key)
+        dedup.rows_out = int(len(df) - duplicated.sum())
+    summary['duplicates'] = int(duplicated.sum())
+    df = df[~duplicated].reset_index(drop=True)
+
+    summary['missing'] = {column: int(count) for column, count in df.isnull().sum().items()}
+    df = fill_and_derive(df, fill_value, date_format)
+
+    summary['shape'] = list(df.shape)
+    df.attrs['cleaning'] = summary
+    return df
+
+
+def memory_report(before, after):
+    """Per-column deep memory use (bytes) and dtype of two versions of a frame.
+
+    Typically the frame loaded with inferred types against the one loaded
+    with :data:`READ_DTYPES`; see also ``df.info(memory_usage='deep')``.
+    """
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'bytes_before': before.memory_usage(index=False, deep=True),
+        'dtype_after': after.dtypes.astype(str),
+        'bytes_after': after.memory_usage(index=False, deep=True),
+    })
+    report.loc['total'] = ['', report['bytes_before'].sum(), '', report['bytes_after'].sum()]
+    report['ratio'] = report['bytes_after'] / report['bytes_before']
+    return report
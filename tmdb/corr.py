@@ -0,0 +1,145 @@
+"""Mergeable Pearson correlation over numeric columns.
+
+Like ``DataFrame.corr()``, each pair of columns uses the rows where both are
+finite. For every pair we keep the row count, the means, the second moments
+and the co-moment over those rows, so batches can be added one at a time and
+partial results from different chunks or workers merged exactly (Chan et
+al.'s pairwise update). :func:`correlation_matrix` is the drop-in
+replacement for ``df.corr()`` and also offers Spearman rank correlation.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .profile import profiled
+
+
+class CorrelationAccumulator(object):
+    """Running pairwise statistics for the Pearson correlation of ``columns``.
+
+    ``columns=None`` takes the numeric columns of the first batch.
+    """
+
+    def __init__(self, columns=None):
+        self.columns = None if columns is None else list(columns)
+        self.n = None
+
+    def _init(self, k):
+        self.n = np.zeros((k, k))
+        # mean[i, j] / m2[i, j]: mean and second moment of column i over the
+        # rows where columns i and j are both finite.
+        self.mean = np.zeros((k, k))
+        self.m2 = np.zeros((k, k))
+        self.comoment = np.zeros((k, k))
+
+    def update(self, frame):
+        """Add the rows of ``frame``."""
+        if self.columns is None:
+            self.columns = list(frame.select_dtypes('number').columns)
+        values = frame[self.columns].to_numpy(dtype=np.float64)
+        valid = np.isfinite(values)
+        weights = valid.astype(np.float64)
+
+        # Shift by the batch means before accumulating raw sums to keep the
+        # cancellation in m2 and the co-moment small.
+        counts = valid.sum(axis=0)
+        totals = np.where(valid, values, 0.0).sum(axis=0)
+        shift = np.where(counts > 0, totals / np.maximum(counts, 1), 0.0)
+        shifted = np.where(valid, values - shift, 0.0)
+
+        n = weights.T @ weights
+        sums = shifted.T @ weights
+        squares = (shifted ** 2).T @ weights
+        products = shifted.T @ shifted
+        with np.errstate(invalid='ignore', divide='ignore'):
+            offset = np.where(n > 0, sums / n, 0.0)
+            m2 = squares - sums * offset
+            comoment = products - sums * offset.T
+        self._combine(n, shift[:, None] + offset, m2, comoment)
+        return self
+
+    def merge(self, other):
+        """Add the statistics accumulated by ``other`` (same columns)."""
+        if other.n is None:
+            return self
+        if self.columns is None:
+            self.columns = list(other.columns)
+        elif self.columns != other.columns:
+            raise ValueError('cannot merge correlations over different columns')
+        self._combine(other.n, other.mean, other.m2, other.comoment)
+        return self
+
+    def _combine(self, n, mean, m2, comoment):
+        if self.n is None:
+            self._init(len(self.columns))
+        total = self.n + n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            share = np.where(total > 0, n / total, 0.0)
+        weight = self.n * share
+        delta = mean - self.mean
+        self.mean = self.mean + delta * share
+        self.m2 = self.m2 + m2 + delta ** 2 * weight
+        self.comoment = self.comoment + comoment + delta * delta.T * weight
+        self.n = total
+
+    def result(self, min_periods=1):
+        """Correlation matrix, laid out like ``DataFrame.corr()``."""
+        columns = self.columns or []
+        if self.n is None:
+            return pd.DataFrame(np.nan, index=columns, columns=columns)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.comoment / np.sqrt(self.m2 * self.m2.T)
+        corr = np.clip(corr, -1.0, 1.0)
+        corr[(self.n < max(min_periods, 2)) | ~np.isfinite(corr)] = np.nan
+        return pd.DataFrame(corr, index=columns, columns=columns)
+
+
+def _pearson(x, y):
+    if len(x) < 2:
+        return np.nan
+    x = x - x.mean()
+    y = y - y.mean()
+    denominator = np.sqrt((x @ x) * (y @ y))
+    return np.clip((x @ y) / denominator, -1.0, 1.0) if denominator > 0 else np.nan
+
+
+def _rank(values):
+    return pd.Series(values).rank().to_numpy()
+
+
+def spearman(df, columns=None):
+    """Spearman rank correlation, as ``df.corr(method='spearman')``.
+
+    Ranks need the whole column, so unlike Pearson this is not accumulated
+    chunk by chunk. Each column is ranked once; a pair is re-ranked on its
+    common rows only when the two columns are not finite on the same rows.
+    """
+    columns = list(df.select_dtypes('number').columns if columns is None else columns)
+    values = df[columns].to_numpy(dtype=np.float64)
+    valid = np.isfinite(values)
+    ranks = [_rank(values[valid[:, i], i]) for i in range(len(columns))]
+    corr = np.full((len(columns), len(columns)), np.nan)
+    for i in range(len(columns)):
+        for j in range(i + 1):
+            both = valid[:, i] & valid[:, j]
+            if both.sum() == valid[:, i].sum() == valid[:, j].sum():
+                x, y = ranks[i], ranks[j]
+            else:
+                x, y = _rank(values[both, i]), _rank(values[both, j])
+            corr[i, j] = corr[j, i] = _pearson(x, y)
+    return pd.DataFrame(corr, index=columns, columns=columns)
+
+
+@profiled('correlation_matrix')
+def correlation_matrix(df, method='pearson', columns=None):
+    """Correlation matrix of the numeric columns of ``df``, replacing ``df.corr()``.
+
+    Non-numeric columns are ignored instead of failing. ``method`` is
+    ``'pearson'`` (computed with :class:`CorrelationAccumulator`) or
+    ``'spearman'``.
+    """
+    if method == 'pearson':
+        return CorrelationAccumulator(columns).update(df).result()
+    if method == 'spearman':
+        return spearman(df, columns)
+    raise ValueError('unknown correlation method %r' % (method,))
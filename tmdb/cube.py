@@ -0,0 +1,105 @@
+"""Pre-aggregated profit statistics by year (and optionally month, genre, company).
+
+Instead of handing every movie to ``sns.lineplot``, which groups the rows
+and bootstraps confidence intervals on each render, we keep count, sum, sum
+of squares, min and max of the profit measures per group. The cube is built
+in one grouped pass, updated in place when new movies arrive, merged across
+chunks, and summarized (mean, standard deviation, 95% interval) in time
+proportional to the number of groups.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .profile import stage
+from .tokens import MULTI_VALUE_COLUMNS, TokenIndex
+
+
+MEASURES = ('prft', 'profits')
+
+STATISTICS = ('count', 'sum', 'sumsq', 'min', 'max')
+
+
+class ProfitCube(object):
+    """Statistics of ``measures`` grouped by ``dimensions``.
+
+    Dimensions are columns of the cleaned frame. A '|'-separated column
+    (genres, cast, production_companies) counts each movie once per token,
+    so cubes with such a dimension must not be summed over it.
+    """
+
+    def __init__(self, dimensions=('release_year',), measures=MEASURES):
+        self.dimensions = list(dimensions)
+        self.measures = list(measures)
+        self.data = None
+
+    @classmethod
+    def build(cls, df, dimensions=('release_year',), measures=MEASURES):
+        with stage('profit_cube', len(df)):
+            return cls(dimensions, measures).update(df)
+
+    def _keys(self, df):
+        """Group keys of every (possibly exploded) row, and the row positions."""
+        multi = [dimension for dimension in self.dimensions if dimension in MULTI_VALUE_COLUMNS]
+        if len(multi) > 1:
+            raise ValueError('at most one multi-valued dimension, got %r' % (multi,))
+        rows = np.arange(len(df))
+        keys = {}
+        if multi:
+            index = TokenIndex.from_series(df[multi[0]])
+            rows = np.repeat(rows, np.diff(index.indptr))
+            keys[multi[0]] = np.asarray(index.tokens, dtype=object)[index.codes]
+        for dimension in self.dimensions:
+            if dimension not in keys:
+                keys[dimension] = df[dimension].to_numpy()[rows]
+        return {dimension: keys[dimension] for dimension in self.dimensions}, rows
+
+    def update(self, df):
+        """Add the movies of ``df`` to the cube."""
+        keys, rows = self._keys(df)
+        part = pd.DataFrame(keys)
+        for measure in self.measures:
+            values = df[measure].to_numpy(dtype=np.float64)[rows]
+            values = np.where(np.isfinite(values), values, np.nan)
+            part[measure] = values
+            part[measure + '_sq'] = values ** 2
+        grouped = part.groupby(self.dimensions, observed=True, sort=True)
+        aggregated = grouped.agg(**{
+            '%s_%s' % (measure, statistic): (measure + ('_sq' if statistic == 'sumsq' else ''),
+                                             'sum' if statistic == 'sumsq' else statistic)
+            for measure in self.measures for statistic in STATISTICS})
+        return self._combine(aggregated)
+
+    def merge(self, other):
+        if other.data is not None:
+            self._combine(other.data)
+        return self
+
+    def _combine(self, part):
+        if self.data is None:
+            self.data = part
+            return self
+        index = self.data.index.union(part.index)
+        left, right = self.data.reindex(index), part.reindex(index)
+        combined = {}
+        for column in left.columns:
+            if column.endswith('_min'):
+                combined[column] = np.fmin(left[column], right[column])
+            elif column.endswith('_max'):
+                combined[column] = np.fmax(left[column], right[column])
+            else:
+                combined[column] = left[column].fillna(0) + right[column].fillna(0)
+        self.data = pd.DataFrame(combined, index=index)
+        return self
+
+    def summary(self, measure='prft'):
+        """Per-group count, mean, std, min, max and normal 95% interval of the mean."""
+        data = self.data
+        count = data[measure + '_count']
+        mean = data[measure + '_sum'] / count
+        variance = (data[measure + '_sumsq'] - count * mean ** 2) / (count - 1)
+        std = np.sqrt(variance.clip(lower=0))
+        margin = 1.96 * std / np.sqrt(count)
+        return pd.DataFrame({'count': count.astype(np.int64), 'mean': mean, 'std': std,
+                             'min': data[measure + '_min'], 'max': data[measure + '_max'],
+                             'ci_low': mean - margin, 'ci_high': mean + margin})
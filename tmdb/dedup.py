@@ -0,0 +1,115 @@
+"""Duplicate detection through 64-bit row hashes.
+
+:func:`duplicated_rows` hashes the cheap columns (numbers, categoricals)
+first and drops every row whose partial hash is already unique, since it
+cannot be a duplicate; the costly text columns are then only hashed for the
+few rows left. Rows that end up sharing a hash are compared value by value,
+so a collision never removes a row. A key subset, e.g.
+:data:`NEAR_DUPLICATE_KEY`, finds rows that describe the same movie even
+when other columns differ.
+
+:func:`row_digests` hashes row contents instead, so digests stay comparable
+between chunks of a file (see :mod:`tmdb.stream`).
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Same title, year and director: the same movie, whatever the other columns say.
+NEAR_DUPLICATE_KEY = ('original_title', 'release_year', 'director')
+
+
+def row_digests(frame):
+    """64-bit digest of every row of ``frame``, independent of chunk dtypes.
+
+    A column can be read as int in one chunk and float (or all-NaN) in the
+    next, so values are normalized to float64 for numbers and object for
+    everything else (text, categoricals) before hashing.
+    """
+    normalized = {}
+    for column in frame.columns:
+        values = frame[column]
+        if not pd.api.types.is_numeric_dtype(values):
+            normalized[column] = values.astype(object)
+        else:
+            normalized[column] = values.astype(np.float64)
+    return pd.util.hash_pandas_object(pd.DataFrame(normalized), index=False).to_numpy()
+
+
+def _mix(keys):
+    """splitmix64 finalizer, applied elementwise to a uint64 array."""
+    keys = keys ^ (keys >> np.uint64(30))
+    keys = keys * np.uint64(0xbf58476d1ce4e5b9)
+    keys = keys ^ (keys >> np.uint64(27))
+    keys = keys * np.uint64(0x94d049bb133111eb)
+    return keys ^ (keys >> np.uint64(31))
+
+
+def _cost(values):
+    if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return 0
+    return 1 if isinstance(values.dtype, pd.CategoricalDtype) else 2
+
+
+def _value_codes(values, rows):
+    """uint64 codes of ``values`` at positions ``rows``: equal values get equal codes."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy()[rows].astype(np.int64).view(np.uint64)
+    if pd.api.types.is_float_dtype(values):
+        floats = values.to_numpy(dtype=np.float64, na_value=np.nan)[rows] + 0.0  # -0.0 == 0.0
+        floats[np.isnan(floats)] = np.nan
+        return floats.view(np.uint64)
+    if pd.api.types.is_integer_dtype(values) or pd.api.types.is_bool_dtype(values):
+        if not values.hasnans:
+            return values.to_numpy(dtype=np.int64)[rows].view(np.uint64)
+    codes, _ = pd.factorize(values.iloc[rows])
+    return codes.astype(np.int64).view(np.uint64)
+
+
+def _same_rows(frame, left, right):
+    """Mask of ``frame`` rows ``left`` equal to rows ``right`` (nulls equal to nulls)."""
+    same = np.ones(len(left), dtype=bool)
+    for column in frame.columns:
+        values = frame[column]
+        a = values.iloc[left].to_numpy(dtype=object)
+        b = values.iloc[right].to_numpy(dtype=object)
+        a_null, b_null = pd.isnull(a), pd.isnull(b)
+        both = ~a_null & ~b_null
+        equal = a_null & b_null
+        equal[both] = a[both] == b[both]
+        same &= equal
+    return same
+
+
+def duplicated_rows(frame, subset=None):
+    """Mask of the rows of ``frame`` that repeat an earlier row, like ``frame.duplicated()``.
+
+    Only the ``subset`` columns are compared when given. The number of
+    duplicates is the sum of the mask.
+    """
+    if subset is not None:
+        frame = frame[list(subset)]
+    rows = np.arange(len(frame))
+    keys = np.zeros(len(frame), dtype=np.uint64)
+    for column in sorted(frame.columns, key=lambda column: _cost(frame[column])):
+        keys = _mix(keys ^ _value_codes(frame[column], rows))
+        repeated = pd.Series(keys).duplicated(keep=False).to_numpy()
+        rows, keys = rows[repeated], keys[repeated]
+        if not len(rows):
+            break
+
+    duplicated = np.zeros(len(frame), dtype=bool)
+    codes, _ = pd.factorize(keys)
+    # Codes are numbered in order of first appearance: a row is the first of
+    # its hash exactly when its code exceeds every code before it.
+    first = np.ones(len(codes), dtype=bool)
+    first[1:] = codes[1:] > np.maximum.accumulate(codes)[:-1]
+    candidates = np.flatnonzero(~first)
+    same = _same_rows(frame, rows[candidates], rows[first][codes[candidates]])
+    duplicated[rows[candidates]] = True
+    if not same.all():
+        for code in np.unique(codes[candidates[~same]]):
+            group = rows[codes == code]
+            duplicated[group] = frame.iloc[group].duplicated().to_numpy()
+    return duplicated
@@ -0,0 +1,130 @@
+"""On-disk cache of analysis results.
+
+Results (``stat()`` tables, value counts, correlation matrices, yearly
+profits) are stored under a key made of the cleaned dataset's fingerprint
+(``df.attrs['fingerprint']``, see :func:`tmdb.load_movies`), the name of the
+analysis and its query arguments, plus :data:`RESULTS_VERSION` and the
+pandas version. An unchanged dataset therefore replays the whole report from
+disk. The store is bounded: once it grows past
+``max_bytes`` the least recently used entries are removed.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+
+import pandas as pd
+
+from .cache import DEFAULT_CACHE_DIR, csv_cache_dir
+
+
+# Bump when an analysis changes in a way that alters its results.
+RESULTS_VERSION = 1
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ResultCache(object):
+    """Pickled results in ``directory``, evicted least recently used first."""
+
+    def __init__(self, directory=os.path.join(DEFAULT_CACHE_DIR, 'results'),
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def for_csv(cls, path, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        """The cache of the results computed from the CSV at ``path``.
+
+        Like :func:`tmdb.load_movies`, ``cache_dir`` is taken relative to the
+        CSV's directory, so results are found whatever the working directory.
+        """
+        return cls(os.path.join(csv_cache_dir(path, cache_dir), 'results'), max_bytes)
+
+    @staticmethod
+    def key(fingerprint, name, query=None):
+        """Stable key of one result; ``query`` must be JSON-like."""
+        text = json.dumps([RESULTS_VERSION, pd.__version__, fingerprint, name, query],
+                          sort_keys=True, default=repr)
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except Exception:
+            # Unreadable, truncated or written by incompatible library
+            # versions (unpickling can raise almost anything): a miss.
+            return default
+        # The modification time doubles as the last access time for eviction.
+        os.utime(path)
+        return value
+
+    def set(self, key, value):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+        self.evict()
+
+    def cached(self, fingerprint, name, query, compute):
+        """The stored result for this key, or ``compute()`` stored for next time.
+
+        ``fingerprint=None`` (a frame that did not come from
+        :func:`tmdb.load_movies`) bypasses the cache.
+        """
+        if fingerprint is None:
+            return compute()
+        key = self.key(fingerprint, name, query)
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            self.misses += 1
+            value = compute()
+            self.set(key, value)
+        else:
+            self.hits += 1
+        return value
+
+    def _entries(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            if name.endswith('.pickle'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Remove least recently used entries until the store fits ``max_bytes``."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, name in self._entries():
+            os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,48 @@
+"""Derived per-movie metrics, computed in one vectorized pass.
+
+``profits_rate`` is only meaningful for movies with a known (positive)
+budget. Instead of dividing by zero and getting ``inf``/``NaN`` rows that
+sort to the top of every ranking, the division is masked: invalid rows get
+``NaN`` and :func:`valid_mask` tells rankings which rows to leave out.
+"""
+
+import numpy as np
+
+
+DERIVED_COLUMNS = ('profits', 'profits_rate', 'prft', 'release_month')
+
+# Raw columns each derived column is computed from.
+DERIVED_FROM = {'profits': ('revenue_adj', 'budget_adj'),
+                'profits_rate': ('revenue_adj', 'budget_adj'),
+                'prft': ('revenue', 'budget'),
+                'release_month': ('release_date',)}
+
+
+def derive_metrics(revenue_adj, budget_adj, revenue, budget, release_date):
+    """``profits``, ``profits_rate``, ``prft`` and ``release_month`` as numpy arrays.
+
+    Money is computed in float64 whatever the input dtype, as these are the
+    sort keys of the rankings. ``release_month`` is 0 where the date is
+    missing. Undefined metrics are ``NaN``, which is what :func:`valid_mask`
+    reads back, including from a cached frame.
+    """
+    revenue_adj = np.asarray(revenue_adj, dtype=np.float64)
+    budget_adj = np.asarray(budget_adj, dtype=np.float64)
+    profits = np.subtract(revenue_adj, budget_adj)
+    rate_valid = budget_adj > 0
+    rate_valid &= np.isfinite(revenue_adj)
+    profits_rate = np.full(len(budget_adj), np.nan)
+    np.divide(revenue_adj, budget_adj, out=profits_rate, where=rate_valid)
+    prft = np.subtract(np.asarray(revenue, dtype=np.float64), np.asarray(budget, dtype=np.float64))
+
+    dates = np.asarray(release_date, dtype='datetime64[ns]')
+    months = dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    release_month = np.where(np.isnat(dates), 0, months).astype(np.int8)
+
+    return {'profits': profits, 'profits_rate': profits_rate, 'prft': prft,
+            'release_month': release_month}
+
+
+def valid_mask(df, column):
+    """Rows of ``df`` where the metric ``column`` is defined (finite)."""
+    return np.isfinite(df[column].to_numpy(dtype=np.float64, na_value=np.nan))
@@ -0,0 +1,246 @@
+"""Success prediction: sparse features and ridge models over the cleaned frame.
+
+:class:`FeatureVocabulary` turns movies into a sparse matrix: one multi-hot
+column per known genre, actor and production company (read from the token
+indexes, without splitting strings row by row), a one-hot release month,
+and the standardized runtime and log budget. The vocabulary is learned once
+and saved with the model, so scoring new movies never rebuilds it.
+
+:class:`SuccessModel` fits one ridge regression per target (``profits``,
+``profits_rate``, ``vote_average``) with LSQR on the sparse matrix; the
+intercept is not penalized. :meth:`SuccessModel.predict` and
+:func:`score_csv` score in batches, so catalogs larger than memory can be
+scored chunk by chunk.
+
+Requires scipy.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .metrics import valid_mask
+from .profile import stage
+from .stream import DEFAULT_CHUNKSIZE, stream_movies
+from .tokens import MULTI_VALUE_COLUMNS, TokenIndex
+
+try:
+    from scipy import sparse
+    from scipy.sparse.linalg import LinearOperator, lsqr
+except ImportError:  # pragma: no cover - scipy is optional
+    sparse = None
+
+
+TARGETS = ('profits', 'profits_rate', 'vote_average')
+
+DEFAULT_BATCH = 100000
+
+
+def _require_scipy():
+    if sparse is None:
+        raise ImportError('tmdb.model needs scipy')
+
+
+class FeatureVocabulary(object):
+    """Feature columns of the success models.
+
+    ``tokens`` maps each multi-valued column to its known tokens and
+    ``scales`` maps ``runtime`` and ``log_budget`` to their ``(mean, std)``.
+    Unknown tokens are ignored when transforming.
+    """
+
+    def __init__(self, tokens, scales):
+        self.tokens = {column: pd.Index(values) for column, values in tokens.items()}
+        self.scales = scales
+
+    @classmethod
+    def build(cls, df, columns=MULTI_VALUE_COLUMNS, min_count=2, indexes=None):
+        """Vocabulary of ``df``: tokens found in at least ``min_count`` movies.
+
+        ``indexes`` are optional prebuilt token indexes of ``df`` (see
+        :func:`tmdb.build_token_indexes`).
+        """
+        tokens = {}
+        for column in columns:
+            index = (indexes or {}).get(column) or TokenIndex.from_series(df[column])
+            tokens[column] = index.tokens[index.counts() >= min_count]
+        numeric = cls._numeric(df)
+        scales = {name: (float(values.mean()), float(values.std()) or 1.0)
+                  for name, values in numeric.items()}
+        return cls(tokens, scales)
+
+    @staticmethod
+    def _numeric(df):
+        budget = df['budget'].to_numpy(dtype=np.float64)
+        return {'runtime': df['runtime'].to_numpy(dtype=np.float64),
+                'log_budget': np.log1p(np.maximum(budget, 0))}
+
+    @property
+    def names(self):
+        """Name of every feature column, in matrix order."""
+        names = ['%s=%s' % (column, token) for column, values in self.tokens.items()
+                 for token in values]
+        names += ['release_month=%d' % month for month in range(1, 13)]
+        return names + ['budget_missing'] + list(self.scales)
+
+    def __len__(self):
+        return len(self.names)
+
+    def transform(self, df, indexes=None):
+        """CSR feature matrix of ``df``, one row per movie."""
+        _require_scipy()
+        n = len(df)
+        rows, cols, data = [], [], []
+        offset = 0
+        for column, known in self.tokens.items():
+            index = (indexes or {}).get(column) or TokenIndex.from_series(df[column])
+            codes = known.get_indexer(index.tokens)[index.codes]
+            row = np.repeat(np.arange(n), np.diff(index.indptr))
+            keep = codes >= 0
+            # A token repeated within a cell still counts once.
+            cells = np.unique(row[keep] * len(known) + codes[keep])
+            rows.append(cells // max(len(known), 1))
+            cols.append(cells % max(len(known), 1) + offset)
+            data.append(np.ones(len(cells)))
+            offset += len(known)
+
+        month = df['release_month'].to_numpy(dtype=np.int64)
+        dated = month > 0
+        rows.append(np.flatnonzero(dated))
+        cols.append(month[dated] - 1 + offset)
+        data.append(np.ones(np.count_nonzero(dated)))
+        offset += 12
+
+        numeric = self._numeric(df)
+        dense = [(df['budget'].to_numpy(dtype=np.float64) <= 0).astype(np.float64)]
+        for name, (mean, std) in self.scales.items():
+            dense.append((numeric[name] - mean) / std)
+        for values in dense:
+            rows.append(np.arange(n))
+            cols.append(np.full(n, offset))
+            data.append(values)
+            offset += 1
+
+        return sparse.csr_matrix(
+            (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(n, offset))
+
+    def to_dict(self):
+        return {'tokens': {column: values.tolist() for column, values in self.tokens.items()},
+                'scales': {name: list(scale) for name, scale in self.scales.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['tokens'], {name: tuple(scale) for name, scale in data['scales'].items()})
+
+
+def _ridge(matrix, y, alpha, iter_lim):
+    """Ridge weights and intercept of ``y`` on ``matrix``.
+
+    The columns are centered implicitly, which keeps ``matrix`` sparse and
+    leaves the intercept unpenalized.
+    """
+    means = np.asarray(matrix.mean(axis=0)).ravel()
+    ones = np.ones(matrix.shape[0])
+    centered = LinearOperator(
+        matrix.shape, dtype=np.float64,
+        matvec=lambda w: matrix @ w - means @ w,
+        rmatvec=lambda r: matrix.T @ r - means * r.sum())
+    target = y.mean()
+    weights = lsqr(centered, y - target * ones, damp=np.sqrt(alpha), iter_lim=iter_lim)[0]
+    return weights, target - means @ weights
+
+
+class SuccessModel(object):
+    """One ridge regression per target over :class:`FeatureVocabulary` features."""
+
+    def __init__(self, vocabulary, weights, intercepts):
+        self.vocabulary = vocabulary
+        self.weights = weights
+        self.intercepts = intercepts
+
+    @property
+    def targets(self):
+        return list(self.weights)
+
+    @classmethod
+    def fit(cls, df, targets=TARGETS, alpha=10.0, vocabulary=None, indexes=None, iter_lim=None,
+            **options):
+        """Fit the models on ``df``; ``options`` are passed to :meth:`FeatureVocabulary.build`.
+
+        Each target is fitted on the movies where it is defined (see
+        :func:`tmdb.valid_mask`), e.g. ``profits_rate`` only where there is a
+        budget.
+        """
+        _require_scipy()
+        with stage('fit_model', len(df)):
+            if vocabulary is None:
+                vocabulary = FeatureVocabulary.build(df, indexes=indexes, **options)
+            matrix = vocabulary.transform(df, indexes)
+            weights, intercepts = {}, {}
+            for target in targets:
+                valid = valid_mask(df, target)
+                weights[target], intercepts[target] = _ridge(
+                    matrix[valid], df[target].to_numpy(dtype=np.float64)[valid], alpha, iter_lim)
+        return cls(vocabulary, weights, intercepts)
+
+    def predict(self, df, batch=DEFAULT_BATCH):
+        """Predicted targets of the movies of ``df``, ``batch`` rows at a time."""
+        parts = []
+        for start in range(0, len(df), batch):
+            rows = df.iloc[start:start + batch]
+            matrix = self.vocabulary.transform(rows)
+            parts.append(pd.DataFrame({target: matrix @ self.weights[target]
+                                       + self.intercepts[target] for target in self.targets},
+                                      index=rows.index))
+        if not parts:
+            return pd.DataFrame(columns=self.targets, dtype=np.float64)
+        return pd.concat(parts)
+
+    def evaluate(self, df):
+        """Coefficient of determination (R²) of each target on ``df``."""
+        with stage('evaluate_model', len(df)):
+            predicted = self.predict(df)
+            scores = {}
+            for target in self.targets:
+                valid = valid_mask(df, target)
+                actual = df[target].to_numpy(dtype=np.float64)[valid]
+                residual = actual - predicted[target].to_numpy()[valid]
+                scores[target] = 1 - (residual @ residual) / ((actual - actual.mean()) ** 2).sum()
+        return pd.Series(scores, name='r2')
+
+    def coefficients(self, target):
+        """Weights of ``target`` by feature name, largest first."""
+        weights = pd.Series(self.weights[target], index=self.vocabulary.names, name=target)
+        return weights.sort_values(ascending=False)
+
+    def save(self, directory):
+        """Write the vocabulary (JSON) and the weights (npz) to ``directory``."""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'vocabulary.json'), 'w') as f:
+            json.dump(self.vocabulary.to_dict(), f)
+        np.savez(os.path.join(directory, 'weights.npz'),
+                 intercepts=np.array([self.intercepts[target] for target in self.targets]),
+                 targets=np.array(self.targets), **self.weights)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, 'vocabulary.json')) as f:
+            vocabulary = FeatureVocabulary.from_dict(json.load(f))
+        with np.load(os.path.join(directory, 'weights.npz')) as saved:
+            targets = saved['targets'].tolist()
+            weights = {target: saved[target] for target in targets}
+            intercepts = dict(zip(targets, saved['intercepts'].tolist()))
+        return cls(vocabulary, weights, intercepts)
+
+
+def score_csv(path, model, chunksize=DEFAULT_CHUNKSIZE, columns=('original_title',), **params):
+    """Yield the predictions for the movies of the CSV at ``path``, one cleaned chunk at a time.
+
+    Each frame has the ``columns`` of the movies followed by the predicted
+    targets; ``params`` are the cleaning parameters of :func:`tmdb.stream_movies`.
+    """
+    for chunk in stream_movies(path, chunksize, **params):
+        yield pd.concat([chunk[list(columns)], model.predict(chunk)], axis=1)
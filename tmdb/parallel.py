@@ -0,0 +1,179 @@
+"""Token indexing and counting across a pool of worker processes.
+
+Splitting and counting '|'-separated strings is pure Python work bound by
+the GIL. Here a column is cut into contiguous row partitions, encoded once
+into a shared memory block (NUL-separated UTF-8 text plus a null mask) and
+each worker indexes or counts its own partition with the serial code.
+Partial results are merged in row order, so token codes, counts and tie
+order are identical to the serial path.
+
+The number of workers defaults to the ``TMDB_WORKERS`` environment variable,
+or 1 (serial, no pool) when it is unset.
+"""
+
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .profile import profiled
+from .sketch import SpaceSaving
+from .tokens import MULTI_VALUE_COLUMNS, TokenIndex, counts_to_frame
+
+
+# Below this many rows per worker a pool costs more than it saves.
+MIN_ROWS_PER_WORKER = 10000
+
+_ROW_SEP = '\x00'
+
+
+def default_workers():
+    """Worker count from ``TMDB_WORKERS``; 1 when unset."""
+    return max(1, int(os.environ.get('TMDB_WORKERS', 1)))
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers the block again with the resource tracker
+        # the workers share with the parent, which is harmless: the parent
+        # unlinks it once all partitions are done.
+        return shared_memory.SharedMemory(name=name)
+
+
+class _SharedColumn(object):
+    """A column's partitions encoded into one shared memory block."""
+
+    def __init__(self, series, partitions):
+        missing = series.isna().to_numpy()
+        # str() of the values, as TokenIndex.from_series does.
+        text = series.astype(object).where(~missing, '').astype(str).tolist()
+        bounds = np.linspace(0, len(text), partitions + 1).astype(np.int64)
+        encoded = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            joined = _ROW_SEP.join(text[start:stop])
+            if joined.count(_ROW_SEP) != max(stop - start - 1, 0):
+                raise ValueError('column %r contains NUL characters' % series.name)
+            encoded.append(joined.encode('utf-8'))
+
+        size = sum(len(part) for part in encoded) + len(missing)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.tasks = []
+        offset = 0
+        mask_offset = size - len(missing)
+        for part, start, stop in zip(encoded, bounds[:-1], bounds[1:]):
+            self.shm.buf[offset:offset + len(part)] = part
+            self.tasks.append((self.shm.name, offset, offset + len(part),
+                               mask_offset + int(start), int(stop - start)))
+            offset += len(part)
+        self.shm.buf[mask_offset:size] = missing.astype(np.uint8).tobytes()
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_partition(task):
+    name, start, stop, mask_start, nrows = task
+    shm = _attach(name)
+    try:
+        text = bytes(shm.buf[start:stop]).decode('utf-8')
+        missing = np.frombuffer(shm.buf[mask_start:mask_start + nrows], dtype=np.uint8).astype(bool)
+    finally:
+        shm.close()
+    rows = text.split(_ROW_SEP) if nrows else []
+    return pd.Series(rows, dtype=object).where(~missing)
+
+
+def _index_partition(task, sep):
+    index = TokenIndex.from_series(_read_partition(task), sep=sep)
+    return index.codes, np.diff(index.indptr), index.tokens.tolist()
+
+
+def _count_partition(task, sep):
+    index = TokenIndex.from_series(_read_partition(task), sep=sep)
+    return index.tokens.tolist(), index.counts()
+
+
+def _sketch_partition(task, sep, capacity):
+    return SpaceSaving(capacity).update(_read_partition(task), sep)
+
+
+def _merge_vocabularies(vocabularies):
+    """Global codes (in first-appearance order) for each partition's tokens."""
+    codes, tokens = pd.factorize(np.array(sum(vocabularies, []), dtype=object), sort=False)
+    offsets = np.cumsum([0] + [len(vocabulary) for vocabulary in vocabularies])
+    return [codes[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])], pd.Index(tokens)
+
+
+def _workers_for(series, workers):
+    workers = default_workers() if workers is None else workers
+    return max(1, min(workers, len(series) // MIN_ROWS_PER_WORKER))
+
+
+def _map_partitions(series, function, workers, sep, executor):
+    with _SharedColumn(series, workers) as column:
+        if executor is not None:
+            return list(executor.map(function, column.tasks, [sep] * len(column.tasks)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(function, column.tasks, [sep] * len(column.tasks)))
+
+
+@profiled('token_index')
+def token_index(series, workers=None, sep='|', executor=None):
+    """:meth:`TokenIndex.from_series` computed across ``workers`` processes."""
+    workers = _workers_for(series, workers)
+    if workers == 1:
+        return TokenIndex.from_series(series, sep=sep)
+    parts = _map_partitions(series, _index_partition, workers, sep, executor)
+    mappings, tokens = _merge_vocabularies([part[2] for part in parts])
+    codes = np.concatenate([mapping[part[0]] for mapping, part in zip(mappings, parts)])
+    indptr = np.zeros(len(series) + 1, dtype=np.int64)
+    np.cumsum(np.concatenate([part[1] for part in parts]), out=indptr[1:])
+    return TokenIndex(codes.astype(np.int32), indptr, tokens, sep=sep)
+
+
+@profiled('value_counts')
+def value_counts(series, workers=None, sep='|', executor=None, approx=None):
+    """Token counts of ``series`` as a ``stat()`` frame; null cells are skipped.
+
+    Each worker counts its partition and the partial counts are merged.
+    ``approx`` counts with :class:`tmdb.SpaceSaving` sketches of that many
+    counters instead (see :func:`tmdb.stat`).
+    """
+    workers = _workers_for(series, workers)
+    if approx is not None:
+        if workers == 1:
+            return SpaceSaving(approx).update(series, sep).top()
+        function = functools.partial(_sketch_partition, capacity=approx)
+        sketches = _map_partitions(series, function, workers, sep, executor)
+        return functools.reduce(SpaceSaving.merge, sketches, SpaceSaving(approx)).top()
+    if workers == 1:
+        return TokenIndex.from_series(series, sep=sep).value_counts()
+    parts = _map_partitions(series, _count_partition, workers, sep, executor)
+    mappings, tokens = _merge_vocabularies([part[0] for part in parts])
+    counts = np.zeros(len(tokens), dtype=np.int64)
+    for mapping, (_, partial) in zip(mappings, parts):
+        np.add.at(counts, mapping, partial)
+    return counts_to_frame(counts, tokens)
+
+
+@profiled('token_indexes')
+def build_token_indexes(df, columns=MULTI_VALUE_COLUMNS, workers=None, sep='|'):
+    """:func:`tmdb.build_token_indexes` with one shared pool for all columns."""
+    if _workers_for(df, workers) == 1:
+        return {column: TokenIndex.from_series(df[column], sep=sep) for column in columns}
+    workers = default_workers() if workers is None else workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return {column: token_index(df[column], workers, sep, executor=pool)
+                for column in columns}
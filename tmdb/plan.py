@@ -0,0 +1,211 @@
+"""Lazy analysis plans over ``tmdb-movies.csv``.
+
+A :class:`Plan` records the steps of an analysis (load and clean the CSV,
+filter, project, keep the best rows, aggregate) and only runs them when a
+result is asked for. It is optimized first:
+
+- projection pushdown: only the raw columns that the filters, projections
+  and aggregations need (and the columns the derived ones are computed
+  from) are given to ``read_csv``;
+- predicate pushdown: filters are applied to every chunk as soon as it is
+  cleaned, so rows that fail them are never accumulated. Filters that come
+  after :meth:`Plan.top` need the final ranking and run on its result.
+
+For example, the loved movies of the report::
+
+    plan = (tmdb.scan('tmdb-movies.csv')
+            .where('vote_count', '>=', 1000)
+            .top('vote_average', 1000)
+            .notnull('production_companies'))
+    print(plan.explain())
+    plan.value_counts('genres')
+"""
+
+import numpy as np
+import pandas as pd
+
+from .clean import DATE_FORMAT, DROPPED_COLUMNS
+from .corr import CorrelationAccumulator
+from .cube import MEASURES, ProfitCube
+from .metrics import DERIVED_FROM
+from .parallel import value_counts
+from .selection import OPERATORS
+from .stats import _top_order
+from .stream import DEFAULT_CHUNKSIZE, TopRows, stream_movies
+
+
+def _needed(steps, output):
+    """Columns ``steps`` read to produce ``output`` (``None`` for all of them)."""
+    needed = None if output is None else set(output)
+    # Walking back from the result, a projection bounds what is needed and
+    # every filter or ranking adds its column.
+    for step in reversed(steps):
+        if step[0] == 'select':
+            needed = set(step[1:]) if needed is None else needed & set(step[1:])
+        elif needed is not None:
+            needed.add(step[1])
+    return needed
+
+
+def _apply(frame, step):
+    """Run one step of a plan on ``frame``."""
+    kind = step[0]
+    if kind == 'select':
+        return frame[list(step[1:])]
+    values = frame[step[1]]
+    if kind == 'top':
+        values = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        return frame.iloc[_top_order(values, step[2], np.isfinite(values))]
+    if kind == 'notnull':
+        return frame[values.notna().to_numpy()]
+    return frame[OPERATORS[step[2]](values, step[3]).to_numpy(dtype=bool)]
+
+
+class Plan(object):
+    """Steps of an analysis of the CSV at ``path``, run lazily in chunks.
+
+    ``params`` are the cleaning parameters of :func:`tmdb.stream_movies`.
+    Every method but the results (:meth:`collect`, :meth:`value_counts`,
+    :meth:`stat`, :meth:`corr`, :meth:`profit_cube`) returns a new plan.
+    """
+
+    def __init__(self, path, chunksize=DEFAULT_CHUNKSIZE, steps=(), drop_columns=DROPPED_COLUMNS,
+                 fill_value=0, date_format=DATE_FORMAT, duplicate_key=None):
+        self.path = path
+        self.chunksize = chunksize
+        self.steps = tuple(steps)
+        self.params = {'drop_columns': drop_columns, 'fill_value': fill_value,
+                       'date_format': date_format, 'duplicate_key': duplicate_key}
+
+    def _then(self, *step):
+        return Plan(self.path, self.chunksize, self.steps + (step,), **self.params)
+
+    def where(self, column, op, value):
+        """Keep the rows where ``column <op> value``, e.g. ``where('vote_count', '>=', 1000)``."""
+        if op not in OPERATORS:
+            raise ValueError('unknown operator %r' % (op,))
+        return self._then('where', column, op, value)
+
+    def notnull(self, column):
+        """Keep the rows where ``column`` is not null."""
+        return self._then('notnull', column)
+
+    def select(self, *columns):
+        """Keep only ``columns`` of the cleaned frame."""
+        return self._then('select', *columns)
+
+    def top(self, sortBy, n):
+        """Keep the ``n`` rows with the highest valid ``sortBy``, best first."""
+        return self._then('top', sortBy, n)
+
+    def _split(self):
+        """Steps run on every chunk, the first ``top`` and the steps after it."""
+        for position, step in enumerate(self.steps):
+            if step[0] == 'top':
+                return self.steps[:position], step, self.steps[position + 1:]
+        return self.steps, None, ()
+
+    def columns(self, output=None):
+        """Raw CSV columns the plan parses when its result reads ``output``.
+
+        ``output`` lists the cleaned columns the result needs; ``None`` means
+        every column left by the plan's projections. ``None`` is returned
+        when every column not dropped by the cleaning must be parsed.
+        """
+        needed = _needed(self.steps, output)
+        key = self.params['duplicate_key']
+        if needed is None or key is None:
+            # Whole-row duplicates can only be recognized on whole rows.
+            return None
+        raw = set(key)
+        for column in needed:
+            raw.update(DERIVED_FROM.get(column, (column,)))
+        return raw
+
+    def explain(self, output=None):
+        """Text description of the optimized plan."""
+        columns = self.columns(output)
+        pushed, top, after = self._split()
+        lines = ['scan %s (%s)' % (self.path, 'all columns but %s' % ', '.join(
+            self.params['drop_columns']) if columns is None else ', '.join(sorted(columns)))]
+        for step in pushed:
+            lines.append('  %s %s  [on each chunk]' % (step[0], ' '.join(map(str, step[1:]))))
+        for step in ((top,) if top else ()) + after:
+            lines.append('  %s %s' % (step[0], ' '.join(map(str, step[1:]))))
+        return '\n'.join(lines)
+
+    def _chunks(self, columns, output=None):
+        """Cleaned chunks after the pushed-down steps, projected on ``output``."""
+        pushed, _, _ = self._split()
+        for chunk in stream_movies(self.path, self.chunksize, columns=columns, **self.params):
+            for step in pushed:
+                chunk = _apply(chunk, step)
+            if output is not None:
+                chunk = chunk[[column for column in chunk.columns if column in output]]
+            yield chunk
+
+    def _run(self, output, update):
+        """Feed ``update`` the rows of the plan, in chunks when there is no ``top``."""
+        _, top, _ = self._split()
+        if top is None:
+            for chunk in self._chunks(self.columns(output), output):
+                update(chunk)
+        else:
+            update(self.collect(output))
+
+    def collect(self, output=None):
+        """Run the plan and return its rows, restricted to ``output`` columns if given."""
+        columns = self.columns(output)
+        pushed, top, after = self._split()
+        if top is None:
+            frames = list(self._chunks(columns, output))
+            if not frames:
+                return pd.DataFrame(columns=output or [])
+            # Chunks emptied by the filters are left out, unless all of them are.
+            return pd.concat([frame for frame in frames if len(frame)] or frames[:1])
+
+        # The ranking keeps the columns the later steps and the result need.
+        later = _needed(after, output)
+        ranking = None
+        for chunk in self._chunks(columns):
+            if ranking is None:
+                chunk_columns = list(chunk.columns)
+                kept = chunk_columns if later is None else [
+                    column for column in chunk_columns if column in later]
+                ranking = TopRows(top[1], top[2], kept)
+            ranking.update(chunk)
+        frame = ranking.rows if ranking is not None and ranking.rows is not None else None
+        if frame is None:
+            return pd.DataFrame(columns=output or [])
+        # In the chunks' order, as without a top step (the ranking puts its key first).
+        frame = frame[[column for column in chunk_columns if column in ranking.columns]]
+        for step in after:
+            frame = _apply(frame, step)
+        if output is not None:
+            frame = frame[[column for column in frame.columns if column in output]]
+        return frame
+
+    def value_counts(self, column, sep='|', approx=None):
+        """Token counts of ``column`` over the plan's rows, like :func:`tmdb.value_counts`."""
+        return value_counts(self.collect([column])[column], sep=sep, approx=approx)
+
+    def stat(self, sortBy, headCount, column):
+        """``stat()`` table of ``column`` among the best ``headCount`` rows of the plan."""
+        return self.top(sortBy, headCount).value_counts(column)
+
+    def corr(self, columns=None):
+        """Pearson correlation matrix of ``columns`` (every numeric column by default)."""
+        accumulator = CorrelationAccumulator(columns)
+        self._run(None if columns is None else list(columns), accumulator.update)
+        return accumulator.result()
+
+    def profit_cube(self, dimensions=('release_year',), measures=MEASURES):
+        """:class:`tmdb.ProfitCube` of the plan's rows, accumulated chunk by chunk."""
+        cube = ProfitCube(dimensions, measures)
+        self._run(list(dimensions) + list(measures), cube.update)
+        return cube
+
+
+def scan(path='tmdb-movies.csv', chunksize=DEFAULT_CHUNKSIZE, **params):
+    """Start a lazy :class:`Plan` over the cleaned movies of the CSV at ``path``."""
+    return Plan(path, chunksize, **params)
@@ -0,0 +1,140 @@
+"""Scatter plots that stay fast and small for any number of movies.
+
+:func:`plotting` draws a plain scatter for small inputs and switches to a
+hexbin density above :data:`DENSITY_THRESHOLD` points. A 2D histogram and
+a stratified downsample (which keeps every occupied region of the plane,
+outliers included) are also available. Given an ``output`` path the figure
+is rendered headless with the Agg backend and written to file instead of
+shown.
+"""
+
+import os
+import re
+import unicodedata
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from .profile import stage
+
+
+DENSITY_THRESHOLD = 5000
+
+MODES = ('auto', 'scatter', 'hexbin', 'hist2d', 'sample')
+
+
+def stratified_sample(x, y, max_points, bins=50, seed=0):
+    """Positions of at most about ``max_points`` points, spread over a ``bins`` x ``bins`` grid.
+
+    Each occupied cell keeps a share of its points proportional to its
+    count, and at least one, so sparse regions are not lost.
+    """
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    if len(x) <= max_points:
+        return np.arange(len(x))
+    cells = (np.digitize(x, np.histogram_bin_edges(x, bins)[1:-1]) * bins
+             + np.digitize(y, np.histogram_bin_edges(y, bins)[1:-1]))
+    counts = np.bincount(cells, minlength=bins * bins)
+    quota = np.maximum(1, np.round(counts * (max_points / len(x)))).astype(np.int64)
+    # Random order within each cell, then keep the first quota[cell] points.
+    order = np.lexsort((np.random.default_rng(seed).random(len(x)), cells))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rank = np.arange(len(x)) - starts[cells[order]]
+    return np.sort(order[rank < quota[cells[order]]])
+
+
+def draw_scatter(ax, x, y, mode='auto', threshold=DENSITY_THRESHOLD, max_points=None,
+                 gridsize=50, seed=0):
+    """Draw ``y`` against ``x`` on ``ax``; returns the mode actually used."""
+    if mode not in MODES:
+        raise ValueError('unknown mode %r, expected one of %s' % (mode, ', '.join(MODES)))
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+    if mode == 'auto':
+        mode = 'scatter' if len(x) <= threshold else 'hexbin'
+    if mode == 'scatter':
+        ax.scatter(x, y, alpha=0.5)
+    elif mode == 'sample':
+        keep = stratified_sample(x, y, max_points or threshold, gridsize, seed)
+        ax.scatter(x[keep], y[keep], alpha=0.5)
+    elif mode == 'hexbin':
+        ax.figure.colorbar(ax.hexbin(x, y, gridsize=gridsize, mincnt=1, bins='log'), ax=ax)
+    else:
+        ax.figure.colorbar(ax.hist2d(x, y, bins=gridsize, cmin=1)[3], ax=ax)
+    return mode
+
+
+def plotting(title, x, y, x_label, y_label, output=None, **options):
+    """The report's scatter plot; ``options`` are passed to :func:`draw_scatter`.
+
+    Shown with pyplot when ``output`` is None, otherwise rendered with Agg
+    and saved to the ``output`` path (format from its extension).
+    """
+    with stage('plotting', len(x)):
+        if output is None:
+            import matplotlib.pyplot as plt
+            ax = plt.figure().add_subplot()
+        else:
+            figure = Figure()
+            FigureCanvasAgg(figure)
+            ax = figure.add_subplot()
+        draw_scatter(ax, x, y, **options)
+        ax.set_xlabel(x_label)
+        ax.set_ylabel(y_label)
+        ax.set_title(title)
+        if output is None:
+            plt.show()
+        else:
+            ax.figure.savefig(output)
+    return output
+
+
+def plot_yearly(summary, title, x_label, y_label, output=None, xlim=None):
+    """Line of ``summary['mean']`` per year with its ``ci_low``/``ci_high`` band.
+
+    ``summary`` is a :meth:`tmdb.ProfitCube.summary` frame. Shown or saved
+    like :func:`plotting`.
+    """
+    with stage('plot_yearly', len(summary)):
+        if output is None:
+            import matplotlib.pyplot as plt
+            ax = plt.figure(figsize=(10, 8)).add_subplot()
+        else:
+            figure = Figure(figsize=(10, 8))
+            FigureCanvasAgg(figure)
+            ax = figure.add_subplot()
+        ax.plot(summary.index, summary['mean'])
+        ax.fill_between(summary.index, summary['ci_low'], summary['ci_high'], alpha=0.2)
+        ax.set_title(title)
+        ax.set_xlabel(x_label)
+        ax.set_ylabel(y_label)
+        if xlim is not None:
+            ax.set_xlim(*xlim)
+        if output is None:
+            plt.show()
+        else:
+            ax.figure.savefig(output)
+    return output
+
+
+class FigureWriter(object):
+    """File names for the figures of one run, derived from their titles."""
+
+    def __init__(self, directory, format='png'):
+        self.directory = directory
+        self.format = format
+        self._used = set()
+
+    def path(self, title):
+        """A path in ``directory`` for ``title``; repeated titles get a suffix."""
+        ascii = unicodedata.normalize('NFKD', title).encode('ascii', 'ignore').decode()
+        slug = re.sub(r'[^a-z0-9]+', '-', ascii.lower()).strip('-') or 'figure'
+        name, number = slug, 1
+        while name in self._used:
+            number += 1
+            name = '%s-%d' % (slug, number)
+        self._used.add(name)
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, '%s.%s' % (name, self.format))
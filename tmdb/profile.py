@@ -0,0 +1,200 @@
+"""Stage-level profiling of the report pipeline.
+
+Every stage of the pipeline (CSV parsing, date parsing, deduplication,
+token indexing, ``stat()`` tables, correlation, aggregation, rendering) runs
+inside :func:`stage` or a :func:`profiled` function. When profiling is on,
+each stage records its wall time, CPU time, traced peak memory and the
+number of rows it received and produced. Records are appended as JSON lines
+to the file named by ``TMDB_PROFILE_LOG`` (or logged on the ``tmdb.profile``
+logger) and a summary table is printed when the run ends.
+
+Profiling is turned on by the ``TMDB_PROFILE`` environment variable: ``1``
+for time and memory, ``time`` for time only (tracemalloc slows allocations
+down). When it is off, a stage costs one attribute lookup.
+"""
+
+import atexit
+import functools
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+# Open stages that trace memory, innermost last, shared by every profiler
+# since there is a single tracemalloc.
+_tracing = []
+
+
+def _rows(value):
+    """Row count of a frame, series or array; ``None`` for anything else."""
+    shape = getattr(value, 'shape', None)
+    return shape[0] if shape else None
+
+
+class Stage(object):
+    """Wall time, CPU time and traced peak memory of one stage.
+
+    ``rows_out`` can be set inside the ``with`` block. ``peak_bytes`` is the
+    peak of memory allocated during the stage on top of what was allocated
+    when it started.
+    """
+
+    def __init__(self, profiler, name, rows_in=None):
+        self.profiler = profiler
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.depth = None
+
+    def __enter__(self):
+        self.depth = len(self.profiler._open)
+        self.profiler._open.append(self)
+        self._traced = self.profiler.memory
+        if self._traced:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started = True
+            else:
+                self._started = False
+            current, peak = tracemalloc.get_traced_memory()
+            if _tracing:
+                # The enclosing stage keeps the peak reached so far, since
+                # resetting it below would lose it.
+                _tracing[-1]._peak = max(_tracing[-1]._peak, peak)
+            tracemalloc.reset_peak()
+            self._base = current
+            self._peak = current
+            _tracing.append(self)
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall = time.perf_counter() - self._wall
+        self.cpu = time.process_time() - self._cpu
+        self.peak = None
+        if self._traced:
+            _tracing.pop()
+            peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            self.peak = peak - self._base
+            if _tracing:
+                _tracing[-1]._peak = max(_tracing[-1]._peak, peak)
+            if self._started:
+                tracemalloc.stop()
+        self.profiler._open.pop()
+        self.profiler._add(self.record())
+
+    def record(self):
+        return {'stage': self.name, 'wall_s': self.wall, 'cpu_s': self.cpu,
+                'peak_bytes': self.peak, 'rows_in': self.rows_in, 'rows_out': self.rows_out,
+                'depth': self.depth}
+
+
+class _NullStage(object):
+    """What :meth:`Profiler.stage` returns when profiling is off."""
+
+    rows_out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Profiler(object):
+    """Collects :class:`Stage` records; does nothing unless ``enabled``.
+
+    ``log`` is a path to append each record to as a JSON line; ``None`` logs
+    them on the ``tmdb.profile`` logger instead.
+    """
+
+    def __init__(self, enabled=False, memory=True, log=None):
+        self.enabled = enabled
+        self.memory = memory
+        self.log = log
+        self.records = []
+        self._open = []
+
+    @classmethod
+    def from_environ(cls, environ=os.environ):
+        setting = environ.get('TMDB_PROFILE', '').strip().lower()
+        enabled = setting not in ('', '0', 'false', 'no', 'off')
+        return cls(enabled, memory=setting != 'time', log=environ.get('TMDB_PROFILE_LOG'))
+
+    def stage(self, name, rows_in=None):
+        """Context manager measuring the enclosed block as stage ``name``."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return Stage(self, name, rows_in)
+
+    def _add(self, record):
+        self.records.append(record)
+        line = json.dumps(record)
+        if self.log is None:
+            logger.info(line)
+        else:
+            with open(self.log, 'a') as f:
+                f.write(line + '\n')
+
+    def summary(self):
+        """Totals per stage name, in order of first appearance."""
+        columns = ['stage', 'calls', 'wall_s', 'cpu_s', 'peak_bytes', 'rows_in', 'rows_out']
+        if not self.records:
+            return pd.DataFrame(columns=columns).set_index('stage')
+        records = pd.DataFrame(self.records)
+        def total(values):
+            # Unknown row counts stay unknown instead of adding up to 0.
+            return values.sum(min_count=1)
+
+        return records.groupby('stage', sort=False).agg(
+            calls=('wall_s', 'size'), wall_s=('wall_s', 'sum'), cpu_s=('cpu_s', 'sum'),
+            peak_bytes=('peak_bytes', 'max'), rows_in=('rows_in', total),
+            rows_out=('rows_out', total))
+
+    def report(self, file=None):
+        if self.records:
+            print(self.summary().to_string(), file=file or sys.stderr)
+
+
+profiler = Profiler.from_environ()
+atexit.register(profiler.report)
+
+
+def stage(name, rows_in=None):
+    """:meth:`Profiler.stage` of the profiler configured by ``TMDB_PROFILE``."""
+    return profiler.stage(name, rows_in)
+
+
+def profiled(name=None):
+    """Decorator profiling each call of a function as stage ``name``.
+
+    ``rows_in`` is the length of the first argument and ``rows_out`` that
+    of the result, when they are frames, series or arrays.
+    """
+    def decorate(function):
+        stage_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            with profiler.stage(stage_name, _rows(args[0]) if args else None) as measured:
+                result = function(*args, **kwargs)
+                measured.rows_out = _rows(result)
+            return result
+        return wrapper
+    return decorate
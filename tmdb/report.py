@@ -0,0 +1,168 @@
+"""Headless report: every figure rendered to file, in parallel, then one HTML page.
+
+A :class:`Report` collects the report's figures (and any tables or text
+between them) instead of showing them. :meth:`Report.render` draws the
+figures in a process pool, each on its own Agg figure, and skips those whose
+input data and options have the same fingerprint as in the previous run
+(kept in ``report.json`` next to the figures). :meth:`Report.write_html`
+assembles everything, figures embedded, into a single HTML file like the
+exported notebook.
+"""
+
+import base64
+import hashlib
+import html
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .parallel import default_workers
+from .plots import FigureWriter, plot_yearly, plotting
+from .profile import stage
+
+
+MANIFEST = 'report.json'
+
+
+def _update(digest, value):
+    if isinstance(value, (pd.Series, pd.DataFrame, pd.Index)):
+        labels = value.columns if isinstance(value, pd.DataFrame) else value.name
+        digest.update(repr(labels).encode())
+        digest.update(pd.util.hash_pandas_object(value).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.dtype, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    else:
+        digest.update(pickle.dumps(value))
+
+
+def _fingerprint(renderer, args, kwargs):
+    """Digest of a figure's renderer, input data and options."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(('%s.%s' % (renderer.__module__, renderer.__qualname__)).encode())
+    for value in args:
+        _update(digest, value)
+    for key in sorted(kwargs):
+        digest.update(key.encode())
+        _update(digest, kwargs[key])
+    return digest.hexdigest()
+
+
+def _render(job):
+    renderer, path, args, kwargs = job
+    renderer(*args, output=path, **kwargs)
+    return path
+
+
+class Report(object):
+    """Figures, tables and text of a report, written under ``directory``.
+
+    ``format`` is ``'png'`` or ``'svg'``. ``workers`` processes render the
+    figures; ``None`` uses the ``TMDB_WORKERS`` setting if there is one, and
+    otherwise one process per CPU (never more than there are figures to draw).
+    """
+
+    def __init__(self, directory, format='png', workers=None):
+        self.directory = directory
+        self.format = format
+        self.workers = workers
+        self.items = []
+        self._paths = FigureWriter(directory, format)
+
+    def figure(self, title, renderer, *args, **kwargs):
+        """Add a figure drawn by ``renderer(*args, output=path, **kwargs)``."""
+        path = self._paths.path(title)
+        self.items.append({'kind': 'figure', 'title': title, 'path': path, 'job': (
+            renderer, path, args, kwargs), 'fingerprint': _fingerprint(renderer, args, kwargs)})
+        return path
+
+    def scatter(self, title, x, y, x_label, y_label, **options):
+        """Add a :func:`tmdb.plotting` figure."""
+        return self.figure(title, plotting, title, x, y, x_label, y_label, **options)
+
+    def yearly(self, summary, title, x_label, y_label, xlim=None):
+        """Add a :func:`tmdb.plots.plot_yearly` figure."""
+        return self.figure(title, plot_yearly, summary, title, x_label, y_label, xlim=xlim)
+
+    def section(self, title):
+        """Start a section; the figures and tables after it are listed under ``title``."""
+        self.items.append({'kind': 'section', 'title': title})
+
+    def table(self, title, frame):
+        """Add a frame (or series) as an HTML table."""
+        if isinstance(frame, pd.Series):
+            frame = frame.to_frame()
+        self.items.append({'kind': 'table', 'title': title, 'html': frame.to_html()})
+
+    def text(self, text):
+        self.items.append({'kind': 'text', 'text': text})
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, MANIFEST)
+
+    def render(self):
+        """Render the figures whose fingerprint changed; returns ``(rendered, skipped)`` paths."""
+        try:
+            with open(self._manifest_path()) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        figures = [item for item in self.items if item['kind'] == 'figure']
+        stale = [item for item in figures
+                 if manifest.get(os.path.basename(item['path'])) != item['fingerprint']
+                 or not os.path.exists(item['path'])]
+        jobs = [item['job'] for item in stale]
+        workers = self.workers
+        if workers is None:
+            workers = default_workers() if 'TMDB_WORKERS' in os.environ else os.cpu_count() or 1
+        with stage('render_report', len(jobs)):
+            if workers > 1 and len(jobs) > 1:
+                with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+                    list(pool.map(_render, jobs))
+            else:
+                for job in jobs:
+                    _render(job)
+
+        for item in figures:
+            manifest[os.path.basename(item['path'])] = item['fingerprint']
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._manifest_path() + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(self._manifest_path() + '.tmp', self._manifest_path())
+        rendered = [item['path'] for item in stale]
+        return rendered, [item['path'] for item in figures if item not in stale]
+
+    def _figure_html(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if self.format == 'svg':
+            return data.decode('utf-8')
+        return '<img src="data:image/%s;base64,%s"/>' % (
+            self.format, base64.b64encode(data).decode('ascii'))
+
+    def write_html(self, path=None, title='Report'):
+        """Write the report, figures embedded, to ``path`` (``report.html`` in ``directory``)."""
+        path = os.path.join(self.directory, 'report.html') if path is None else path
+        body = []
+        for item in self.items:
+            if item['kind'] == 'text':
+                body.append('<p>%s</p>' % html.escape(item['text']))
+                continue
+            if item['kind'] == 'section':
+                body.append('<h2>%s</h2>' % html.escape(item['title']))
+                continue
+            body.append('<h3>%s</h3>' % html.escape(item['title']))
+            if item['kind'] == 'table':
+                body.append(item['html'])
+            else:
+                body.append(self._figure_html(item['path']))
+        page = ('<!DOCTYPE html>\n<html>\n<head><meta charset="utf-8" />\n'
+                '<title>%s</title>\n</head>\n<body>\n<h1>%s</h1>\n%s\n</body>\n</html>\n'
+                % (html.escape(title), html.escape(title), '\n'.join(body)))
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(page)
+        return path
@@ -0,0 +1,104 @@
+"""Non-destructive row selections over the cleaned frame.
+
+A :class:`Selection` is a set of row positions of a base frame, narrowed by
+chained predicates (``where``, ``notnull``, ``top``). The base frame is never
+modified and nothing is copied until :meth:`Selection.frame` or
+:meth:`Selection.column` is called. Predicate masks are cached per base
+frame, so asking for the same threshold again costs nothing.
+"""
+
+import operator
+
+import numpy as np
+
+from .metrics import valid_mask
+from .stats import Rankings, _top_order
+
+
+OPERATORS = {'<': operator.lt, '<=': operator.le, '==': operator.eq,
+             '!=': operator.ne, '>=': operator.ge, '>': operator.gt}
+
+
+class MaskCache(object):
+    """Boolean predicate masks over a frame, keyed by ``(column, op, value)``."""
+
+    def __init__(self, df):
+        self.df = df
+        self._masks = {}
+
+    def __len__(self):
+        return len(self._masks)
+
+    def mask(self, column, op, value=None):
+        key = (column, op, value)
+        mask = self._masks.get(key)
+        if mask is None:
+            values = self.df[column]
+            if op == 'notnull':
+                mask = values.notna().to_numpy()
+            elif op in OPERATORS:
+                mask = OPERATORS[op](values, value).to_numpy(dtype=bool)
+            else:
+                raise ValueError('unknown operator %r' % (op,))
+            self._masks[key] = mask
+        return mask
+
+
+class Selection(object):
+    """Rows of ``df`` selected by composable predicates.
+
+    ``rows`` are positions in ``df``, in selection order (rank order after
+    :meth:`top`); ``None`` means every row in frame order. ``steps`` records
+    the predicates applied so far, e.g. to key cached results. ``rankings``
+    is an optional :class:`tmdb.Rankings` of ``df`` reused by :meth:`top` on
+    the whole frame.
+    """
+
+    def __init__(self, df, rows=None, masks=None, rankings=None, steps=()):
+        self.df = df
+        self.rows = rows
+        self.masks = MaskCache(df) if masks is None else masks
+        self.rankings = Rankings(df) if rankings is None else rankings
+        self.steps = tuple(steps)
+
+    def _derive(self, rows, *step):
+        return Selection(self.df, rows, self.masks, self.rankings, self.steps + (step,))
+
+    @property
+    def positions(self):
+        """Selected row positions as an array."""
+        return np.arange(len(self.df)) if self.rows is None else self.rows
+
+    def __len__(self):
+        return len(self.df) if self.rows is None else len(self.rows)
+
+    def _filter(self, mask, *step):
+        if self.rows is None:
+            return self._derive(np.flatnonzero(mask), *step)
+        return self._derive(self.rows[mask[self.rows]], *step)
+
+    def where(self, column, op, value):
+        """Keep the rows where ``column <op> value``, e.g. ``where('vote_count', '>=', 1000)``."""
+        return self._filter(self.masks.mask(column, op, value), 'where', column, op, value)
+
+    def notnull(self, column):
+        """Keep the rows where ``column`` is not null."""
+        return self._filter(self.masks.mask(column, 'notnull'), 'notnull', column)
+
+    def top(self, sortBy, n):
+        """Keep the ``n`` rows with the highest valid ``sortBy``, best first."""
+        if self.rows is None:
+            return self._derive(self.rankings.top(sortBy, n), 'top', sortBy, n)
+        values = self.df[sortBy].to_numpy()[self.rows]
+        valid = valid_mask(self.df, sortBy)[self.rows]
+        return self._derive(self.rows[_top_order(values, n, valid)], 'top', sortBy, n)
+
+    def column(self, name):
+        """Values of one column for the selected rows."""
+        values = self.df[name]
+        return values if self.rows is None else values.iloc[self.rows]
+
+    def frame(self, columns=None):
+        """Materialize the selected rows (optionally only ``columns``)."""
+        df = self.df if columns is None else self.df[list(columns)]
+        return df if self.rows is None else df.iloc[self.rows]
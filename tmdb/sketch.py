@@ -0,0 +1,107 @@
+"""Bounded-memory heavy hitters for the ``stat()`` tables.
+
+The report only reads the head (5, 10 or 50 rows) of token counts over
+actors or companies, so counting every token exactly is not needed on huge
+samples. :class:`SpaceSaving` keeps at most ``capacity`` counters. Each
+batch of rows is counted exactly and merged into the counters, dropping the
+smallest, with the rule of Agarwal et al., *Mergeable Summaries* (2012):
+a token missing from one side is counted as that side's smallest counter.
+For every kept token this gives
+
+    count - error <= true count <= count
+
+with ``error <= total / capacity``, ``total`` being the number of tokens
+seen. Sketches built on different partitions merge with the same rule.
+With ``capacity`` at least the number of distinct tokens the counts are
+exact and the table matches :meth:`tmdb.TokenIndex.value_counts`.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .tokens import TokenIndex
+
+
+DEFAULT_CAPACITY = 1000
+DEFAULT_BATCH = 100000
+
+
+class SpaceSaving(object):
+    """At most ``capacity`` token counters with per-token overestimation bounds.
+
+    Tokens are kept in order of first appearance, so ties sort the way they
+    do in exact counts.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError('capacity must be positive, got %r' % (capacity,))
+        self.capacity = capacity
+        self.counts = pd.Series([], dtype=np.int64)
+        self.errors = pd.Series([], dtype=np.int64)
+        self.total = 0
+
+    @classmethod
+    def from_series(cls, series, capacity=DEFAULT_CAPACITY, sep='|'):
+        """Sketch of the tokens of ``series``."""
+        return cls(capacity).update(series, sep)
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def floor(self):
+        """Upper bound on the count of any token the sketch does not hold."""
+        return int(self.counts.min()) if len(self.counts) >= self.capacity else 0
+
+    def update(self, series, sep='|', batch=DEFAULT_BATCH):
+        """Add the tokens of the cells of ``series``; null cells are skipped.
+
+        Cells are split and counted exactly ``batch`` rows at a time, so the
+        memory used beyond the counters is bounded by the batch.
+        """
+        for start in range(0, len(series), batch):
+            index = TokenIndex.from_series(series.iloc[start:start + batch], sep=sep)
+            counts = pd.Series(index.counts(), index=index.tokens, dtype=np.int64)
+            # An exact summary: room for every token, so nothing is missing.
+            exact = SpaceSaving(len(counts) + 1)
+            exact.counts = counts
+            exact.errors = pd.Series(0, index=counts.index, dtype=np.int64)
+            exact.total = int(counts.sum())
+            self.merge(exact)
+        return self
+
+    def merge(self, other):
+        """Add the counts of another sketch."""
+        floor, other_floor = self.floor, other.floor
+        new = other.counts.index.difference(self.counts.index, sort=False)
+        keys = self.counts.index.append(new)
+        counts = (self.counts.reindex(keys, fill_value=floor)
+                  + other.counts.reindex(keys, fill_value=other_floor))
+        errors = (self.errors.reindex(keys, fill_value=floor)
+                  + other.errors.reindex(keys, fill_value=other_floor))
+        if len(keys) > self.capacity:
+            # Keep the largest counters, earliest first on ties, in their
+            # original (first appearance) order.
+            order = np.lexsort((np.arange(len(keys)), -counts.to_numpy()))
+            keep = np.sort(order[:self.capacity])
+            counts, errors = counts.iloc[keep], errors.iloc[keep]
+        self.counts, self.errors = counts, errors
+        self.total += other.total
+        return self
+
+    def top(self, n=None):
+        """``stat()``-like frame of the ``n`` largest counts with their ``error``.
+
+        ``guaranteed`` marks the tokens certain to be among the true top
+        rows: their lowest possible count is at least the highest possible
+        count of every token ranked after them, kept or dropped.
+        """
+        order = np.lexsort((np.arange(len(self.counts)), -self.counts.to_numpy()))
+        counts = self.counts.to_numpy()[order]
+        errors = self.errors.to_numpy()[order]
+        frame = pd.DataFrame({'count': counts, 'error': errors}, index=self.counts.index[order])
+        # Counts are decreasing, so the next row bounds every row below.
+        below = np.maximum(np.append(counts[1:], self.floor), self.floor)
+        frame['guaranteed'] = counts - errors >= below
+        return frame if n is None else frame.head(n)
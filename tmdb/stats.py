@@ -0,0 +1,172 @@
+"""Frequency tables over the top movies, as used throughout the EDA."""
+
+import numpy as np
+
+from .metrics import valid_mask
+from .profile import profiled
+from .sketch import SpaceSaving
+from .tokens import TokenIndex, counts_to_frame
+
+
+def _top_order(values, n, valid=None):
+    """Positions of the ``n`` largest valid values, best first.
+
+    Equivalent to a stable descending sort of the valid rows truncated to
+    ``n`` (ties keep row order) but only sorts the candidates that can make
+    the cut, found with an O(len) partition. Rows outside ``valid`` (by
+    default, non-finite values) are left out, so fewer than ``n`` positions
+    may come back.
+    """
+    key = -np.asarray(values, dtype=np.float64)
+    if valid is None:
+        valid = np.isfinite(key)
+    key = np.where(valid, key, np.nan)
+    n = min(n, int(np.count_nonzero(valid)))
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    kth = np.partition(key, n - 1)[n - 1]
+    candidates = np.flatnonzero(key <= kth)
+    return candidates[np.argsort(key[candidates], kind='stable')][:n]
+
+
+class Ranking(object):
+    """Descending order of one column, extended lazily to the largest top-N asked.
+
+    ``valid`` is an optional mask of the rows that may be ranked (see
+    :func:`tmdb.metrics.valid_mask`); non-finite values are never ranked.
+    """
+
+    def __init__(self, values, valid=None):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.valid = valid
+        self._order = np.zeros(0, dtype=np.int64)
+        self._asked = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def top(self, n):
+        """Row positions of the ``n`` best rows; prefixes of one another."""
+        n = min(n, len(self.values))
+        # A short order means every valid row is already in it.
+        if n > self._asked and len(self._order) == self._asked:
+            self._order = _top_order(self.values, n, self.valid)
+            self._asked = n
+        return self._order[:n]
+
+
+class Rankings(object):
+    """One cached :class:`Ranking` per sort key of a frame, over its valid rows."""
+
+    def __init__(self, df):
+        self.df = df
+        self._rankings = {}
+
+    def __getitem__(self, sortBy):
+        ranking = self._rankings.get(sortBy)
+        if ranking is None:
+            ranking = self._rankings[sortBy] = Ranking(self.df[sortBy].to_numpy(),
+                                                       valid_mask(self.df, sortBy))
+        return ranking
+
+    def top(self, sortBy, headCount):
+        return self[sortBy].top(headCount)
+
+
+# The (sortBy, headCount, column) tables of the report's first research question.
+REPORT_QUERIES = tuple(
+    [(sortBy, headCount, column)
+     for column in ('genres', 'cast', 'production_companies')
+     for sortBy in ('profits', 'profits_rate')
+     for headCount in (50, 1000)]
+    + [('profits', 50, 'release_month'), ('profits_rate', 100, 'release_month')])
+
+
+@profiled('stat_many')
+def stat_many(df, queries, indexes=None, rankings=None, approx=None):
+    """Run several ``stat()`` queries in one pass per sort key.
+
+    ``queries`` is an iterable of ``(sortBy, headCount, column)``. Each sort
+    key is ranked once, up to its largest ``headCount``; smaller samples are
+    prefixes of that ranking, so the counts of each sample are built on top
+    of those of the next smaller one. Returns a dict keyed by query.
+    ``indexes``, ``rankings`` and ``approx`` are as for :func:`stat`.
+    """
+    if rankings is None:
+        rankings = Rankings(df)
+    if indexes is None:
+        indexes = {}
+    plan = {}
+    for sortBy, headCount, column in queries:
+        plan.setdefault(sortBy, {}).setdefault(column, set()).add(headCount)
+
+    results = {}
+    for sortBy, columns in plan.items():
+        ranking = rankings[sortBy]
+        if len(ranking) != len(df):
+            raise ValueError('ranking for %r was built on %d rows, frame has %d'
+                             % (sortBy, len(ranking), len(df)))
+        rows = ranking.top(max(max(sizes) for sizes in columns.values()))
+        for column, sizes in columns.items():
+            if approx is not None:
+                for headCount, frame in _prefix_sketches(df[column], rows, sorted(sizes), approx):
+                    results[(sortBy, headCount, column)] = frame
+                continue
+            index = indexes.get(column)
+            if index is None:
+                index = TokenIndex.from_series(df[column].iloc[rows])
+                positions = np.arange(len(rows))
+            elif index.n_rows != len(df):
+                raise ValueError('token index for %r was built on %d rows, frame has %d'
+                                 % (column, index.n_rows, len(df)))
+            else:
+                positions = rows
+            for headCount, frame in _prefix_counts(index, positions, sorted(sizes)):
+                results[(sortBy, headCount, column)] = frame
+    return results
+
+
+def _prefix_counts(index, positions, sizes):
+    """Yield ``(size, value_counts)`` of the first ``size`` positions, for increasing sizes."""
+    codes = index.row_codes(positions)
+    lengths = index.indptr[positions + 1] - index.indptr[positions]
+    ends = np.concatenate([[0], np.cumsum(lengths)])
+    # First appearance in a prefix is first appearance in the whole sequence.
+    first = np.full(len(index.tokens), len(codes), dtype=np.int64)
+    present, where = np.unique(codes, return_index=True)
+    first[present] = where
+
+    counts = np.zeros(len(index.tokens), dtype=np.int64)
+    done = 0
+    for size in sizes:
+        stop = ends[min(size, len(positions))]
+        counts += np.bincount(codes[done:stop], minlength=len(index.tokens))
+        done = stop
+        yield size, counts_to_frame(counts, index.tokens, first)
+
+
+def _prefix_sketches(series, rows, sizes, capacity):
+    """Yield ``(size, SpaceSaving.top())`` of the first ``size`` rows, for increasing sizes."""
+    sketch = SpaceSaving(capacity)
+    done = 0
+    for size in sizes:
+        stop = min(size, len(rows))
+        sketch.update(series.iloc[rows[done:stop]])
+        done = stop
+        yield size, sketch.top()
+
+
+@profiled('stat')
+def stat(df, sortBy, headCount, column, indexes=None, rankings=None, approx=None):
+    """Count the values of ``column`` among the top ``headCount`` movies.
+
+    ``indexes`` maps column names to prebuilt :class:`TokenIndex` objects
+    (see :func:`build_token_indexes` and :class:`TokenIndexes`); columns
+    without one are split on the fly. ``rankings`` is an optional
+    :class:`Rankings` cache for ``df`` so repeated calls on the same sort key
+    share one ordering. ``approx`` counts with a :class:`tmdb.SpaceSaving`
+    sketch of that many counters instead, in fixed memory; the table then
+    also has the ``error`` bound and ``guaranteed`` flag of each count.
+    """
+    query = (sortBy, headCount, column)
+    return stat_many(df, [query], indexes, rankings, approx)[query]
@@ -0,0 +1,207 @@
+"""Chunked ingestion of ``tmdb-movies.csv`` for files larger than memory.
+
+:func:`stream_movies` reads the CSV in chunks and cleans each one like
+:func:`tmdb.clean_movies`, removing duplicates across chunks with a set of
+64-bit row digests. :class:`StreamingAnalysis` keeps the results the report
+needs (the ``stat()`` tables, the correlation matrix and the yearly profit
+cube) as running accumulators that can also be merged across partitions, so
+they match the in-memory run while only one chunk is held at a time.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .clean import DATE_FORMAT, DROPPED_COLUMNS, fill_and_derive, read_movies_csv
+from .corr import CorrelationAccumulator
+from .cube import ProfitCube
+from .dedup import row_digests
+from .tokens import TokenIndex
+
+
+DEFAULT_CHUNKSIZE = 100000
+
+
+def _contains(block, values):
+    positions = np.searchsorted(block, values)
+    return block[np.minimum(positions, len(block) - 1)] == values
+
+
+class DigestSet(object):
+    """Set of uint64 digests stored as a few sorted numpy blocks.
+
+    Costs 8 bytes per distinct row instead of a Python object per entry.
+    Blocks are merged like a binary counter, so there are O(log n) of them.
+    """
+
+    def __init__(self):
+        self._blocks = []
+
+    def __len__(self):
+        return sum(len(block) for block in self._blocks)
+
+    def add(self, digests):
+        """Add ``digests``; return the mask of those not seen before.
+
+        Within ``digests`` only the first occurrence of a value counts as new.
+        """
+        digests = np.asarray(digests, dtype=np.uint64)
+        new = ~pd.Series(digests).duplicated().to_numpy()
+        for block in self._blocks:
+            new &= ~_contains(block, digests)
+        block = np.sort(digests[new])
+        while self._blocks and len(self._blocks[-1]) <= len(block):
+            block = np.sort(np.concatenate([self._blocks.pop(), block]), kind='mergesort')
+        if len(block):
+            self._blocks.append(block)
+        return new
+
+
+def stream_movies(path, chunksize=DEFAULT_CHUNKSIZE, drop_columns=DROPPED_COLUMNS,
+                  fill_value=0, date_format=DATE_FORMAT, duplicate_key=None, summary=None,
+                  columns=None):
+    """Yield the cleaned movies of the CSV at ``path``, ``chunksize`` raw rows at a time.
+
+    Concatenating the chunks gives the same frame as :func:`tmdb.clean_movies`
+    on the whole file, index included. The dropped columns are never parsed,
+    nor any column outside ``columns`` when given (see :mod:`tmdb.plan`).
+    Duplicates are recognized on the ``duplicate_key`` columns, or on all
+    parsed columns, by their 64-bit digest alone, without the exact
+    comparison of :func:`tmdb.dedup.duplicated_rows`. If ``summary`` is a
+    dict it is filled with the same cleaning summary as
+    ``df.attrs['cleaning']``, complete once the generator is exhausted.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    dropped = set(drop_columns)
+    usecols = [column for column in header if column not in dropped
+               and (columns is None or column in columns)]
+
+    if summary is None:
+        summary = {}
+    summary.update({'raw_shape': [0, len(header)], 'dropped_columns': list(drop_columns),
+                    'duplicates': 0, 'missing': dict.fromkeys(usecols, 0)})
+    seen = DigestSet()
+    offset = 0
+    cleaned_columns = None
+    for chunk in read_movies_csv(path, usecols=usecols, chunksize=chunksize):
+        chunk = chunk[usecols]
+        summary['raw_shape'][0] += len(chunk)
+        key = chunk if duplicate_key is None else chunk[list(duplicate_key)]
+        new = seen.add(row_digests(key))
+        summary['duplicates'] += int(len(chunk) - new.sum())
+        chunk = chunk[new]
+        for column, count in chunk.isnull().sum().items():
+            summary['missing'][column] += int(count)
+
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        cleaned = fill_and_derive(chunk, fill_value, date_format)
+        cleaned_columns = cleaned.columns
+        yield cleaned
+    summary['shape'] = [offset, len(cleaned_columns) if cleaned_columns is not None else 0]
+
+
+class TopRows(object):
+    """The ``n`` best rows by ``sortBy`` seen so far.
+
+    Rows with a non-finite ``sortBy`` are skipped and ties are broken by row
+    position, like the ranking used by :func:`tmdb.stat`, so the retained
+    rows are the same as in memory provided row labels are global positions
+    (as :func:`stream_movies` yields them).
+    """
+
+    def __init__(self, sortBy, n, columns=()):
+        self.sortBy = sortBy
+        self.n = n
+        self.columns = list(dict.fromkeys([sortBy] + list(columns)))
+        self.rows = None
+
+    def update(self, chunk):
+        self._keep(chunk[self.columns])
+        return self
+
+    def merge(self, other):
+        if other.rows is not None:
+            self._keep(other.rows[self.columns])
+        return self
+
+    def _keep(self, frame):
+        if self.rows is not None and len(self.rows):
+            frame = pd.concat([self.rows, frame]) if len(frame) else self.rows
+        key = -frame[self.sortBy].to_numpy(dtype=np.float64)
+        # Rows with an undefined metric are never ranked, as in memory.
+        keep = np.isfinite(key)
+        if np.count_nonzero(keep) > self.n:
+            kth = np.partition(key[keep], self.n - 1)[self.n - 1]
+            keep &= key <= kth
+        frame, key = frame[keep], key[keep]
+        order = np.lexsort((frame.index.to_numpy(), key))[:self.n]
+        self.rows = frame.iloc[order]
+
+    def stat(self, column, headCount=None):
+        """``stat()`` table of ``column`` over the best ``headCount`` rows."""
+        rows = self.rows.iloc[:headCount] if self.rows is not None else None
+        if rows is None or column not in rows:
+            raise KeyError(column)
+        return TokenIndex.from_series(rows[column]).value_counts()
+
+
+class StreamingAnalysis(object):
+    """Report results accumulated chunk by chunk.
+
+    ``queries`` lists the ``(sortBy, headCount, column)`` combinations that
+    :meth:`stat` will be asked for; the rows they need are kept as they go
+    by. ``corr_columns=None`` correlates every numeric column, like
+    ``df.corr()``.
+    """
+
+    def __init__(self, queries=(), corr_columns=None):
+        self.queries = list(queries)
+        self.top = {}
+        for sortBy, headCount, column in self.queries:
+            top = self.top.get(sortBy)
+            if top is None:
+                self.top[sortBy] = TopRows(sortBy, headCount, [column])
+            else:
+                top.n = max(top.n, headCount)
+                top.columns = list(dict.fromkeys(top.columns + [column]))
+        self.correlation = CorrelationAccumulator(corr_columns)
+        self.yearly = ProfitCube()
+        self.rows = 0
+        self.cleaning = None
+
+    def update(self, chunk):
+        for top in self.top.values():
+            top.update(chunk)
+        self.correlation.update(chunk)
+        self.yearly.update(chunk)
+        self.rows += len(chunk)
+        return self
+
+    def merge(self, other):
+        for sortBy, top in other.top.items():
+            self.top[sortBy].merge(top)
+        self.correlation.merge(other.correlation)
+        self.yearly.merge(other.yearly)
+        self.rows += other.rows
+        return self
+
+    def stat(self, sortBy, headCount, column):
+        if sortBy not in self.top or headCount > self.top[sortBy].n:
+            raise KeyError((sortBy, headCount, column))
+        return self.top[sortBy].stat(column, headCount)
+
+    def corr(self):
+        return self.correlation.result()
+
+
+def analyze_csv(path, queries=(), corr_columns=None, chunksize=DEFAULT_CHUNKSIZE, **params):
+    """Run the report's aggregations over the CSV at ``path`` in chunks.
+
+    ``params`` are the cleaning parameters of :func:`stream_movies`. The
+    cleaning summary is stored in the returned analysis' ``cleaning``.
+    """
+    analysis = StreamingAnalysis(queries, corr_columns)
+    analysis.cleaning = {}
+    for chunk in stream_movies(path, chunksize, summary=analysis.cleaning, **params):
+        analysis.update(chunk)
+    return analysis
@@ -0,0 +1,133 @@
+"""Synthetic ``tmdb-movies.csv`` data of any size, for benchmarks.
+
+The frames have the columns, types and missing-value rates of the TMDb
+export, with '|'-separated genres, cast and companies whose vocabularies
+grow with the number of movies and whose popularity is heavy-tailed, like
+the real ones (a few actors and companies appear in many movies).
+"""
+
+import numpy as np
+import pandas as pd
+
+
+COLUMNS = ('id', 'imdb_id', 'popularity', 'budget', 'revenue', 'original_title', 'cast',
+           'homepage', 'director', 'tagline', 'keywords', 'overview', 'runtime', 'genres',
+           'production_companies', 'release_date', 'vote_count', 'vote_average',
+           'release_year', 'budget_adj', 'revenue_adj')
+
+# Genres and how many TMDb movies have each one.
+GENRES = {'Drama': 4760, 'Comedy': 3793, 'Thriller': 2908, 'Action': 2385, 'Romance': 1712,
+          'Horror': 1637, 'Adventure': 1471, 'Crime': 1355, 'Family': 1231,
+          'Science Fiction': 1230, 'Fantasy': 916, 'Mystery': 810, 'Animation': 699,
+          'Documentary': 520, 'Music': 408, 'History': 334, 'War': 270, 'Foreign': 188,
+          'TV Movie': 167, 'Western': 165}
+
+# Share of missing values per column, as in the TMDb export.
+MISSING = {'cast': 0.007, 'homepage': 0.73, 'director': 0.004, 'tagline': 0.26,
+           'keywords': 0.14, 'overview': 0.0004, 'genres': 0.002,
+           'production_companies': 0.095, 'imdb_id': 0.001}
+
+# Distinct actors / companies / directors per movie in the TMDb export.
+VOCABULARY_PER_MOVIE = {'cast': 1.8, 'production_companies': 0.75, 'director': 0.5}
+
+
+def _ranks(rng, size, vocabulary, skew=0.4):
+    """Power-law draws in ``range(vocabulary)``, rank 0 the most frequent.
+
+    Frequencies fall like ``rank ** -skew``; 0.4 puts the most frequent actor
+    or company in about 0.2% of the draws at TMDb sizes, as in the export.
+    """
+    return (vocabulary * rng.random(size) ** (1 / (1 - skew))).astype(np.int64)
+
+
+def _names(prefix, ids):
+    unique, inverse = np.unique(ids, return_inverse=True)
+    return np.array(['%s %d' % (prefix, i) for i in unique], dtype=object)[inverse.ravel()]
+
+
+def _join(tokens, counts):
+    """'|'-join the first ``counts[i]`` entries of each row of ``tokens``."""
+    joined = tokens[:, 0]
+    for j in range(1, tokens.shape[1]):
+        joined = joined + np.where(counts > j, '|' + tokens[:, j], '')
+    return joined
+
+
+def _genres(rng, n, max_tokens=5):
+    # Weighted sampling without replacement (Gumbel top-k), so a movie never
+    # lists the same genre twice.
+    weights = np.array(list(GENRES.values()), dtype=np.float64)
+    keys = np.log(weights) + rng.gumbel(size=(n, len(weights)))
+    chosen = np.argsort(-keys, axis=1)[:, :max_tokens]
+    counts = rng.choice(np.arange(1, max_tokens + 1), n, p=[0.22, 0.37, 0.27, 0.11, 0.03])
+    return _join(np.array(list(GENRES), dtype=object)[chosen], counts)
+
+
+def _people(rng, n, prefix, vocabulary, max_tokens):
+    ids = _ranks(rng, (n, max_tokens), vocabulary)
+    counts = rng.integers(1, max_tokens + 1, n)
+    return _join(_names(prefix, ids).reshape(n, max_tokens), counts)
+
+
+def generate_movies(n, seed=0, duplicates=0.0001, total=None):
+    """A raw TMDb-shaped frame of ``n`` movies (plus a few duplicated rows).
+
+    ``total`` is the size of the whole dataset when it is generated in
+    several parts; vocabularies are sized for it.
+    """
+    rng = np.random.default_rng(seed)
+    total = n if total is None else total
+    year = rng.integers(1960, 2016, n)
+    inflation = 1.035 ** (2015 - year)
+    budget = np.round(rng.lognormal(16.5, 1.3, n), -3) * (rng.random(n) > 0.52)
+    revenue = np.round(budget * rng.lognormal(0.6, 1.2, n) + rng.lognormal(15, 2, n), -2)
+    revenue *= rng.random(n) > 0.55
+    month, day = rng.integers(1, 13, n), rng.integers(1, 29, n)
+    sentences = np.array(['Synthetic overview sentence number %d, long enough to weigh like '
+                          'a real plot summary of a movie.' % i for i in range(1000)],
+                         dtype=object)
+
+    def vocabulary(column):
+        return max(1, int(total * VOCABULARY_PER_MOVIE[column]))
+
+    df = pd.DataFrame({
+        'id': np.arange(n) + 1,
+        'imdb_id': np.char.add('tt', np.arange(n).astype(str)).astype(object),
+        'popularity': np.round(rng.lognormal(-0.9, 1.0, n), 6),
+        'budget': budget.astype(np.int64),
+        'revenue': revenue.astype(np.int64),
+        'original_title': _names('Movie', rng.integers(0, total, n)),
+        'cast': _people(rng, n, 'Actor', vocabulary('cast'), 5),
+        'homepage': np.char.add('http://www.movie', np.arange(n).astype(str)).astype(object),
+        'director': _names('Director', _ranks(rng, n, vocabulary('director'))),
+        'tagline': sentences[rng.integers(0, 1000, n)],
+        'keywords': _people(rng, n, 'keyword', 5000, 5),
+        'overview': sentences[rng.integers(0, 1000, n)],
+        'runtime': rng.normal(102, 25, n).clip(0, 900).astype(np.int64),
+        'genres': _genres(rng, n),
+        'production_companies': _people(rng, n, 'Company', vocabulary('production_companies'), 3),
+        'release_date': ['%d/%d/%02d' % row for row in zip(month, day, year % 100)],
+        'vote_count': np.ceil(rng.lognormal(3.5, 1.6, n)).astype(np.int64) + 9,
+        'vote_average': np.round(rng.normal(6.0, 0.9, n).clip(1.5, 9.2), 1),
+        'release_year': year,
+        'budget_adj': budget * inflation,
+        'revenue_adj': revenue * inflation,
+    }, columns=list(COLUMNS))
+    for column, share in MISSING.items():
+        df.loc[rng.random(n) < share, column] = np.nan
+    if duplicates:
+        df = pd.concat([df, df.sample(frac=duplicates, random_state=seed)], ignore_index=True)
+    return df
+
+
+def write_movies_csv(path, n, seed=0, chunksize=1000000):
+    """Write ``n`` synthetic movies to ``path``, generated ``chunksize`` at a time."""
+    written = 0
+    while True:
+        size = min(chunksize, n - written)
+        chunk = generate_movies(size, seed=seed + written, total=n)
+        chunk['id'] += written
+        chunk.to_csv(path, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+        written += size
+        if written >= n:
+            return path
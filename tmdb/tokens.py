@@ -0,0 +1,142 @@
+"""Exploded token tables for the '|'-separated columns of the TMDb data.
+
+Columns such as ``genres``, ``cast`` or ``production_companies`` hold several
+values per movie joined with ``'|'``. Instead of re-joining and re-splitting
+those strings for every count, we explode them once into an integer-coded
+table (movie row -> token code) and count any subset of rows with
+``np.bincount``.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+MULTI_VALUE_COLUMNS = ('genres', 'cast', 'production_companies')
+
+
+class TokenIndex(object):
+    """Row -> token codes for one column, stored in CSR layout.
+
+    The codes of row ``i`` are ``codes[indptr[i]:indptr[i + 1]]`` and token
+    ``c`` is ``tokens[c]``; tokens are coded in order of first appearance.
+    Rows are positions in the frame the index was built from, not index
+    labels.
+    """
+
+    def __init__(self, codes, indptr, tokens, sep='|'):
+        self.codes = codes
+        self.indptr = indptr
+        self.tokens = tokens
+        self.sep = sep
+
+    @classmethod
+    def from_series(cls, series, sep='|'):
+        """Index the tokens of ``series``; null cells have no tokens.
+
+        Each distinct cell value is split once, then the rows are mapped to
+        the tokens of their value, which is much cheaper than splitting every
+        row when values repeat (genres, directors, companies).
+        """
+        values, uniques = pd.factorize(series)
+        split = pd.Series(np.asarray(uniques, dtype=object)).astype(str)
+        split = split.str.split(sep, regex=False)
+        lengths = split.str.len().to_numpy(dtype=np.int64)
+        codes, tokens = pd.factorize(split.explode().to_numpy(), sort=False)
+        indptr = np.zeros(len(uniques) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        by_value = cls(codes.astype(np.int32), indptr, pd.Index(tokens), sep=sep)
+
+        present = values >= 0
+        value_lengths, lengths = lengths, np.zeros(len(values), dtype=np.int64)
+        lengths[present] = value_lengths[values[present]]
+        indptr = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        return cls(by_value.row_codes(values[present]), indptr, by_value.tokens, sep=sep)
+
+    @property
+    def n_rows(self):
+        return len(self.indptr) - 1
+
+    def row_codes(self, rows):
+        """Concatenated token codes of the given row positions."""
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        if len(rows) == 0:
+            return self.codes[:0]
+        # Offset of each gathered code inside its own row, added to the row
+        # start: a vectorized concatenation of the per-row slices.
+        ends = np.cumsum(lengths)
+        within = np.arange(ends[-1]) - np.repeat(ends - lengths, lengths)
+        return self.codes[np.repeat(starts, lengths) + within]
+
+    def counts(self, rows=None):
+        """Occurrences of every token code among ``rows`` (all rows if None)."""
+        codes = self.codes if rows is None else self.row_codes(rows)
+        return np.bincount(codes, minlength=len(self.tokens))
+
+    def value_counts(self, rows=None):
+        """``value_counts().to_frame()`` of the tokens found in ``rows``.
+
+        Tokens with equal counts keep the order in which they first appear in
+        ``rows``.
+        """
+        codes = self.codes if rows is None else self.row_codes(rows)
+        first = np.full(len(self.tokens), len(codes), dtype=np.int64)
+        present, positions = np.unique(codes, return_index=True)
+        first[present] = positions
+        return counts_to_frame(np.bincount(codes, minlength=len(self.tokens)), self.tokens, first)
+
+
+def counts_to_frame(counts, tokens, first=None):
+    """Turn a dense count vector into the frame returned by ``stat()``.
+
+    Sorted by decreasing count, then by ``first`` (e.g. first appearance) if
+    given, else by token code.
+    """
+    present = np.flatnonzero(counts)
+    tiebreak = present if first is None else first[present]
+    order = present[np.lexsort((tiebreak, -counts[present]))]
+    return pd.Series(counts[order], index=tokens[order], name='count').to_frame()
+
+
+def build_token_indexes(df, columns=MULTI_VALUE_COLUMNS, sep='|', workers=None):
+    """Build a :class:`TokenIndex` for each column, keyed by column name.
+
+    ``workers`` > 1 splits the work across processes (see
+    :mod:`tmdb.parallel`); ``None`` uses the ``TMDB_WORKERS`` setting.
+    """
+    from . import parallel
+    return parallel.build_token_indexes(df, columns, workers=workers, sep=sep)
+
+
+class TokenIndexes(object):
+    """Token indexes of a frame's multi-valued columns, each built on first use.
+
+    Can be passed as ``indexes`` to :func:`tmdb.stat` and
+    :func:`tmdb.stat_many` when the results may come from a cache and the
+    indexes may not be needed at all.
+    """
+
+    def __init__(self, df, columns=MULTI_VALUE_COLUMNS, sep='|', workers=None):
+        self.df = df
+        self.columns = tuple(columns)
+        self.sep = sep
+        self.workers = workers
+        self._indexes = {}
+
+    def get(self, column, default=None):
+        if column not in self.columns:
+            return default
+        index = self._indexes.get(column)
+        if index is None:
+            from . import parallel
+            index = self._indexes[column] = parallel.token_index(
+                self.df[column], self.workers, self.sep)
+        return index
+
+    def __getitem__(self, column):
+        index = self.get(column)
+        if index is None:
+            raise KeyError(column)
+        return index